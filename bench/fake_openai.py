@@ -0,0 +1,70 @@
+"""
+A stand-in for the OpenAI chat-completions endpoint. Returns canned intent JSON chosen by keyword
+after a configurable delay, so benchmarks measure our own overhead rather than the model's.
+Model lookups, which the service uses to warm its connection pool, are answered immediately.
+"""
+import asyncio
+import json
+import os
+import time
+import uuid
+
+from fastapi import FastAPI, Request
+
+FAKE_OPENAI_LATENCY_MS = float(os.getenv("FAKE_OPENAI_LATENCY_MS", "300"))
+
+# First keyword match wins; keywords are checked against the lower-cased query.
+CANNED_INTENTS = [
+    (["total compensation", "total pay", "إجمالي الراتب"], {"intent": "highest_total_compensation", "limit": 3}),
+    (["average", "avg", "متوسط"], {"intent": "aggregate_metric", "dimension": "rank", "metric": "avg", "metric_column": "base_salary"}),
+    (["which rank", "أي رتبة"], {"intent": "find_top_group", "dimension": "rank", "metric_column": "base_salary", "metric": "sum", "ranking": "highest"}),
+    (["married", "متزوج"], {"intent": "conditional_aggregate_count", "dimension": "rank",
+                            "conditions": [{"column": "marital_status", "operator": "eq", "value": "Married"}]}),
+    (["how many", "count", "عدد"], {"intent": "total_count"}),
+    (["top", "highest", "أعلى"], {"intent": "ordered_list", "order_by_column": "base_salary", "ascending": False, "limit": 5}),
+    (["rank", "رتبة"], {"intent": "aggregate_count", "dimension": "rank"}),
+    (["weather", "طقس"], {"intent": "unsupported", "reason": "I can only answer questions about employee records."}),
+]
+
+app = FastAPI(title="Fake OpenAI")
+
+
+def classify(query: str) -> dict:
+    lowered = query.lower()
+    for keywords, intent in CANNED_INTENTS:
+        if any(keyword in lowered for keyword in keywords):
+            return intent
+    # Anything else is treated as a name search on its last word.
+    name = query.split()[-1] if query.split() else query
+    return {"intent": "filter", "conditions": [{"column": "full_name_en", "operator": "ilike", "value": name}]}
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    messages = body.get("messages", [])
+    user_messages = [m["content"] for m in messages if m.get("role") == "user"]
+    query = user_messages[-1].removeprefix("Latest Query:").strip() if user_messages else ""
+    await asyncio.sleep(FAKE_OPENAI_LATENCY_MS / 1000)
+
+    content = json.dumps(classify(query), ensure_ascii=False)
+    prompt_tokens = sum(len(m.get("content", "")) for m in messages) // 4
+    completion_tokens = len(content) // 4
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "gpt-4-turbo"),
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        },
+    }
+
+
+@app.get("/v1/models/{model}")
+async def retrieve_model(model: str):
+    """Answers the service's warm-up request."""
+    return {"id": model, "object": "model", "created": 0, "owned_by": "benchmark"}
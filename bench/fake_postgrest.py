@@ -0,0 +1,187 @@
+"""
+A stand-in for the Supabase PostgREST API backed by a seeded synthetic qag_employees table.
+Supports the subset of the table API the service uses (select, filters, or=, order, limit/offset,
+exact counts and HEAD requests) and the RPCs the tool router calls, computed with the snapshot engine.
+"""
+import asyncio
+import csv
+import json
+import os
+
+import numpy as np
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import JSONResponse
+
+from snapshot_engine import EmployeeSnapshot
+from bench.synthetic import generate_employees
+
+FAKE_SUPABASE_LATENCY_MS = float(os.getenv("FAKE_SUPABASE_LATENCY_MS", "20"))
+FAKE_SUPABASE_ROWS = int(os.getenv("FAKE_SUPABASE_ROWS", "2000"))
+
+snapshot = EmployeeSnapshot(generate_employees(FAKE_SUPABASE_ROWS))
+
+app = FastAPI(title="Fake PostgREST")
+
+OPERATORS = {"eq", "neq", "gt", "gte", "lt", "lte", "like", "ilike", "in", "is"}
+
+
+class FilterError(ValueError):
+    pass
+
+
+def _split_top_level(text: str) -> list[str]:
+    """Splits on commas that are not inside parentheses or double quotes."""
+    parts, depth, quoted, current = [], 0, False, []
+    for char in text:
+        if char == '"':
+            quoted = not quoted
+        elif not quoted and char == "(":
+            depth += 1
+        elif not quoted and char == ")":
+            depth -= 1
+        elif not quoted and depth == 0 and char == ",":
+            parts.append("".join(current))
+            current = []
+            continue
+        current.append(char)
+    parts.append("".join(current))
+    return parts
+
+
+def _unquote(value: str) -> str:
+    return value[1:-1].replace('\\"', '"') if len(value) >= 2 and value[0] == value[-1] == '"' else value
+
+
+def _filter_mask(column: str, expression: str) -> np.ndarray:
+    """Evaluates one PostgREST filter such as 'gt.5', 'not.is.null' or 'in.(1,2)'."""
+    negate = expression.startswith("not.")
+    if negate:
+        expression = expression[4:]
+    operator, _, value = expression.partition(".")
+    if operator not in OPERATORS:
+        raise FilterError(f"unknown operator '{operator}'")
+    if operator == "in":
+        inner = value[1:-1]
+        values = next(csv.reader([inner], skipinitialspace=True)) if inner else []
+        condition = {"column": column, "operator": "in", "value": values}
+    elif operator in ("like", "ilike"):
+        # The service already wraps ilike values in '%...%'; the snapshot adds its own, so strip one layer.
+        pattern = _unquote(value).replace("*", "%")
+        if operator == "ilike" and len(pattern) >= 2 and pattern[0] == pattern[-1] == "%":
+            pattern = pattern[1:-1]
+        condition = {"column": column, "operator": operator, "value": pattern}
+    else:
+        condition = {"column": column, "operator": operator, "value": None if value == "null" else _unquote(value)}
+    try:
+        mask = snapshot._condition_mask(condition)
+    except ValueError as e:
+        raise FilterError(str(e))
+    return ~mask if negate else mask
+
+
+def _logic_mask(expression: str, combine) -> np.ndarray:
+    """Evaluates the body of an or=(...) / and(...) group."""
+    masks = []
+    for part in _split_top_level(expression):
+        if part.startswith(("and(", "or(")):
+            name, _, inner = part.partition("(")
+            masks.append(_logic_mask(inner[:-1], np.logical_and if name == "and" else np.logical_or))
+        else:
+            column, _, rest = part.partition(".")
+            masks.append(_filter_mask(column, rest))
+    result = masks[0]
+    for mask in masks[1:]:
+        result = combine(result, mask)
+    return result
+
+
+def _sort_key(indices: np.ndarray, order: str) -> list:
+    keys = []
+    for term in reversed(order.split(",")):
+        column, _, direction = term.partition(".")
+        descending = direction.startswith("desc")
+        if column in snapshot.numeric:
+            values = snapshot.numeric[column][indices]
+            values = np.where(np.isnan(values), np.inf, -values if descending else values)
+            keys.append(values)
+        else:
+            ranks = np.unique(snapshot.text[column][indices], return_inverse=True)[1]
+            keys.append(-ranks if descending else ranks)
+    return keys
+
+
+async def _latency():
+    await asyncio.sleep(FAKE_SUPABASE_LATENCY_MS / 1000)
+
+
+def _error(message: str, status_code: int = 400) -> JSONResponse:
+    return JSONResponse({"message": message, "code": "PGRST100", "details": None, "hint": None}, status_code=status_code)
+
+
+@app.api_route("/rest/v1/{table}", methods=["GET", "HEAD"])
+async def read_table(table: str, request: Request):
+    await _latency()
+    if table != "qag_employees":
+        return _error(f"relation '{table}' does not exist", 404)
+
+    mask = np.ones(snapshot.size, dtype=bool)
+    select, order, limit, offset = "*", None, None, 0
+    try:
+        for key, value in request.query_params.multi_items():
+            if key == "select":
+                select = value
+            elif key == "order":
+                order = value
+            elif key == "limit":
+                limit = int(value)
+            elif key == "offset":
+                offset = int(value)
+            elif key == "or":
+                mask &= _logic_mask(value[1:-1], np.logical_or)
+            else:
+                mask &= _filter_mask(key, value)
+    except FilterError as e:
+        return _error(str(e))
+
+    indices = np.flatnonzero(mask)
+    total = len(indices)
+    if order:
+        indices = indices[np.lexsort(_sort_key(indices, order))]
+    indices = indices[offset:offset + limit if limit is not None else None]
+
+    headers = {}
+    if "count=exact" in request.headers.get("prefer", ""):
+        headers["content-range"] = f"{offset}-{offset + len(indices) - 1}/{total}" if len(indices) else f"*/{total}"
+    if request.method == "HEAD":
+        return Response(status_code=200, headers=headers)
+
+    columns = None if select == "*" else [c.strip() for c in select.split(",")]
+    try:
+        rows = snapshot._project(indices, columns)
+    except ValueError as e:
+        return _error(str(e))
+    return Response(json.dumps(rows, ensure_ascii=False), media_type="application/json", headers=headers)
+
+
+@app.post("/rest/v1/rpc/{function}")
+async def call_rpc(function: str, request: Request):
+    await _latency()
+    args = await request.json()
+    try:
+        if function == "get_ordered_employees":
+            rows = snapshot.ordered(args["order_by_column"], args["is_ascending"], args["limit_count"])
+        elif function == "get_top_employees_by_total_compensation":
+            rows = snapshot.top_total_compensation(args["limit_count"])
+        elif function == "get_counts_by_dimension":
+            rows = snapshot.count_by(args["dimension_column"])
+        elif function == "get_aggregate_by_dimension":
+            rows = snapshot.aggregate_by(args["dimension_column"], args["metric_column"], args["metric_type"])
+        elif function == "get_conditional_counts_by_dimension":
+            rows = snapshot.count_by(args["dimension_column"], args.get("filters", []))
+        elif function == "get_top_category_by_metric":
+            rows = snapshot.top_group(args["dimension_column"], args["metric_column"], args["metric_type"], args["is_descending"])
+        else:
+            return _error(f"function {function} does not exist", 404)
+    except (KeyError, ValueError) as e:
+        return _error(f"invalid arguments for {function}: {e}")
+    return Response(json.dumps(rows, ensure_ascii=False), media_type="application/json")
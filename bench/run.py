@@ -0,0 +1,238 @@
+"""
+Offline load test for the Employee Q&A API.
+
+Starts local stand-ins for OpenAI and Supabase, launches `main:app` under uvicorn pointed at them,
+then drives /chat at increasing concurrency and reports throughput, p50/p95/p99 latency and the
+server's memory growth per intent. No network access or credentials are needed.
+
+    python -m bench.run
+    python -m bench.run --concurrency 1 16 64 --requests 300 --replay queries.jsonl --output bench_output.txt
+    python -m bench.run --no-cache
+
+Each phase repeats a few queries, so by default most requests are intent- and result-cache hits.
+--no-cache turns both caches off in the service, so every request takes the LLM and Supabase path.
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+import httpx
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+# A JWT-shaped placeholder; the stand-in never checks it.
+FAKE_SUPABASE_KEY = "eyJhbGciOiJIUzI1NiJ9.eyJyb2xlIjoiYW5vbiJ9.benchmark"
+
+# Queries per intent. Some resolve on the fast path, the rest go through the fake LLM.
+WORKLOAD = {
+    "total_count": ["How many employees are there?", "كم عدد الموظفين؟", "what's our headcount overall"],
+    "ordered_list": ["top 5 by base_salary", "أعلى 5 موظفين حسب الراتب الأساسي", "show the highest paid people"],
+    "aggregate_count": ["count by rank", "عدد الموظفين حسب الرتبة", "break down staff per rank please"],
+    "aggregate_metric": ["average base salary by rank", "متوسط الراتب حسب الرتبة"],
+    "find_top_group": ["which rank has the largest payroll?"],
+    "conditional_aggregate_count": ["married employees per rank"],
+    "highest_total_compensation": ["who has the highest total compensation?"],
+    "filter": ["details of Salman", "تفاصيل نواف", "find Bandar"],
+    "unsupported": ["what is the weather today?"],
+}
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_in_thread(app, port: int):
+    import uvicorn
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+def rss_kb(pid: int) -> int | None:
+    """Resident set size of a process from /proc (Linux only)."""
+    try:
+        for line in Path(f"/proc/{pid}/status").read_text().splitlines():
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    except OSError:
+        return None
+    return None
+
+
+def percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def load_replay(path: str) -> list[str]:
+    """Queries from an NDJSON file: plain strings or objects with a "query" (or "body") field."""
+    queries = []
+    for line in Path(path).read_text(encoding="utf-8").splitlines():
+        if not line.strip():
+            continue
+        record = json.loads(line)
+        query = record if isinstance(record, str) else record.get("query") or record.get("body")
+        if query:
+            queries.append(query)
+    return queries
+
+
+async def run_phase(client: httpx.AsyncClient, queries: list[str], total: int, concurrency: int, pid: int) -> dict:
+    """Sends `total` requests cycling through `queries` with at most `concurrency` in flight."""
+    await client.post("/cache/flush")
+    latencies, errors = [], 0
+    slots = asyncio.Semaphore(concurrency)
+    baseline = rss_kb(pid)
+    peak = baseline
+    done = asyncio.Event()
+
+    async def sample_memory():
+        nonlocal peak
+        while not done.is_set():
+            current = rss_kb(pid)
+            if current is not None and (peak is None or current > peak):
+                peak = current
+            await asyncio.sleep(0.05)
+
+    async def one(i: int):
+        nonlocal errors
+        async with slots:
+            started = time.perf_counter()
+            try:
+                response = await client.post("/chat", json={"query": queries[i % len(queries)]})
+                if response.status_code != 200 or "error occurred" in response.json().get("message", ""):
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append(time.perf_counter() - started)
+
+    sampler = asyncio.create_task(sample_memory())
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    elapsed = time.perf_counter() - started
+    done.set()
+    await sampler
+
+    return {
+        "requests": total,
+        "errors": errors,
+        "throughput_rps": round(total / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+        "rss_growth_kb": (peak - baseline) if peak is not None and baseline is not None else None,
+    }
+
+
+async def drive(base_url: str, pid: int, phases: dict[str, list[str]], concurrency_levels: list[int], total: int,
+                cached: bool = True) -> list[dict]:
+    limits = httpx.Limits(max_connections=max(concurrency_levels), max_keepalive_connections=max(concurrency_levels))
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120) as client:
+        results = []
+        for concurrency in concurrency_levels:
+            for name, queries in phases.items():
+                result = await run_phase(client, queries, total, concurrency, pid)
+                results.append({"phase": name, "concurrency": concurrency, "cached": cached, **result})
+                print(
+                    f"{name:<28} c={concurrency:<4} {result['throughput_rps']:>8} rps  "
+                    f"p50={result['p50_ms']:>7}ms p95={result['p95_ms']:>7}ms p99={result['p99_ms']:>7}ms  "
+                    f"errors={result['errors']:<4} rss+={result['rss_growth_kb']}KB",
+                    flush=True,
+                )
+        return results
+
+
+def start_stand_ins(llm_latency_ms: float, db_latency_ms: float, rows: int) -> dict:
+    """Starts the fake OpenAI and PostgREST servers in this process; returns the environment that points the API at them."""
+    openai_port, postgrest_port = free_port(), free_port()
+    os.environ.update({
+        "FAKE_OPENAI_LATENCY_MS": str(llm_latency_ms),
+        "FAKE_SUPABASE_LATENCY_MS": str(db_latency_ms),
+        "FAKE_SUPABASE_ROWS": str(rows),
+        "SUPABASE_URL": f"http://127.0.0.1:{postgrest_port}",
+        "SUPABASE_KEY": FAKE_SUPABASE_KEY,
+        "OPENAI_API_KEY": "sk-benchmark",
+        "OPENAI_BASE_URL": f"http://127.0.0.1:{openai_port}/v1",
+    })
+
+    from bench import fake_openai, fake_postgrest
+
+    start_in_thread(fake_openai.app, openai_port)
+    start_in_thread(fake_postgrest.app, postgrest_port)
+    return os.environ.copy()
+
+
+def launch_api(port: int, env: dict) -> subprocess.Popen:
+    # The service runs in its own process so its latency and memory aren't mixed with the stand-ins'.
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=REPO_ROOT,
+        env=env,
+        stdout=subprocess.DEVNULL,
+    )
+
+
+def wait_for(url: str, server: subprocess.Popen, timeout: float = 60) -> float:
+    """Polls url until it answers 200; returns how long that took."""
+    started = time.perf_counter()
+    while True:
+        try:
+            if httpx.get(url).status_code == 200:
+                return time.perf_counter() - started
+        except httpx.HTTPError:
+            pass
+        if server.poll() is not None or time.perf_counter() - started > timeout:
+            raise SystemExit(f"The API server did not answer {url}.")
+        time.sleep(0.02)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32, 128])
+    parser.add_argument("--requests", type=int, default=200, help="requests per phase")
+    parser.add_argument("--intents", nargs="+", choices=sorted(WORKLOAD), help="only benchmark these intents")
+    parser.add_argument("--replay", help="NDJSON file of queries to replay as an extra phase")
+    parser.add_argument("--llm-latency-ms", type=float, default=300)
+    parser.add_argument("--db-latency-ms", type=float, default=20)
+    parser.add_argument("--rows", type=int, default=2000, help="rows in the synthetic qag_employees table")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--no-cache", action="store_true", help="disable the intent and result caches to measure the uncached path")
+    args = parser.parse_args()
+
+    env = start_stand_ins(args.llm_latency_ms, args.db_latency_ms, args.rows)
+    if args.no_cache:
+        env.update({"INTENT_CACHE_ENABLED": "false", "RESULT_CACHE_ENABLED": "false"})
+    app_port = free_port()
+    server = launch_api(app_port, env)
+    base_url = f"http://127.0.0.1:{app_port}"
+    try:
+        # Measure the warmed-up service, not its cold start (see bench.startup for that).
+        wait_for(base_url + "/ready", server)
+        phases = {name: WORKLOAD[name] for name in (args.intents or WORKLOAD)}
+        if args.replay:
+            phases["replay"] = load_replay(args.replay)
+        results = asyncio.run(drive(base_url, server.pid, phases, args.concurrency, args.requests, not args.no_cache))
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2, ensure_ascii=False), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
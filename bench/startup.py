@@ -0,0 +1,72 @@
+"""
+Cold-start check for the Employee Q&A API.
+
+Measures how long `import main` takes in a fresh interpreter, then launches the service against
+the local OpenAI and Supabase stand-ins and times how long it takes to answer the liveness check
+(`/`) and the readiness check (`/ready`). Exits non-zero if any measurement is over its budget.
+
+    python -m bench.startup
+    python -m bench.startup --runs 5 --import-budget-ms 800 --live-budget-ms 1500 --ready-budget-ms 5000
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+
+from bench.run import REPO_ROOT, free_port, launch_api, start_stand_ins, wait_for
+
+IMPORT_PROBE = "import time; started = time.perf_counter(); import main; print(time.perf_counter() - started)"
+
+
+def measure_import(env: dict) -> float:
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_PROBE], cwd=REPO_ROOT, env=env, capture_output=True, text=True, check=True,
+    ).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def measure_startup(env: dict) -> tuple[float, float]:
+    """Seconds from spawning uvicorn until / and then /ready answer 200."""
+    port = free_port()
+    server = launch_api(port, env)
+    try:
+        live = wait_for(f"http://127.0.0.1:{port}/", server)
+        ready = live + wait_for(f"http://127.0.0.1:{port}/ready", server)
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+    return live, ready
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3, help="cold starts to measure; the median is reported")
+    parser.add_argument("--import-budget-ms", type=float, default=1200)
+    parser.add_argument("--live-budget-ms", type=float, default=2000)
+    parser.add_argument("--ready-budget-ms", type=float, default=5000)
+    parser.add_argument("--rows", type=int, default=2000, help="rows in the synthetic qag_employees table")
+    args = parser.parse_args()
+
+    env = start_stand_ins(llm_latency_ms=0, db_latency_ms=5, rows=args.rows)
+    imports, lives, readies = [], [], []
+    for _ in range(args.runs):
+        imports.append(measure_import(env))
+        live, ready = measure_startup(env)
+        lives.append(live)
+        readies.append(ready)
+
+    over_budget = False
+    for name, values, budget in (
+        ("import main", imports, args.import_budget_ms),
+        ("live (/)", lives, args.live_budget_ms),
+        ("ready (/ready)", readies, args.ready_budget_ms),
+    ):
+        median_ms = statistics.median(values) * 1000
+        status = "ok" if median_ms <= budget else "OVER BUDGET"
+        over_budget |= median_ms > budget
+        print(f"{name:<16} median={median_ms:>8.1f}ms  max={max(values) * 1000:>8.1f}ms  budget={budget:>7.0f}ms  {status}")
+    sys.exit(1 if over_budget else 0)
+
+
+if __name__ == "__main__":
+    main()
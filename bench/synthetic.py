@@ -0,0 +1,61 @@
+import random
+from datetime import date, datetime, timedelta, timezone
+
+FIRST_NAMES = [
+    ("سلمان", "Salman"), ("نواف", "Nawaf"), ("بندر", "Bandar"), ("أحمد", "Ahmed"), ("محمد", "Mohammed"),
+    ("خالد", "Khalid"), ("عبدالله", "Abdullah"), ("فهد", "Fahad"), ("إبراهيم", "Ibrahim"), ("علي", "Ali"),
+    ("حمد", "Hamad"), ("جاسم", "Jassim"), ("ناصر", "Nasser"), ("سعود", "Saud"), ("يوسف", "Youssef"),
+]
+FAMILY_NAMES = [
+    ("الهاجري", "Al Hajri"), ("النعيمي", "Al Naimi"), ("المري", "Al Marri"), ("الكواري", "Al Kuwari"),
+    ("العطية", "Al Attiyah"), ("السليطي", "Al Sulaiti"), ("المهندي", "Al Muhannadi"), ("الدوسري", "Al Dosari"),
+]
+RANKS = [
+    ("Private", 6000), ("Corporal", 7500), ("Sergeant", 9000), ("Lieutenant", 11000),
+    ("Captain", 13000), ("Major", 15000), ("Colonel", 17500), ("Lieutenant General", 19500),
+]
+MARITAL_STATUSES = ["Single", "Married", "Divorced", "Widowed"]
+POSITIONS = ["قائد عام", "قائد كتيبة", "ضابط عمليات", "ضابط إداري", "فني اتصالات", "مسعف", "سائق", "حارس"]
+ALLOWANCES = [
+    "civil_clothing_allowance", "military_clothing_allowance", "housing_allowance", "phone_allowance",
+    "unit_allowance", "social_allowance", "transport_allowance", "position_allowance",
+    "specialty_allowance", "risk_allowance",
+]
+
+
+def generate_employees(count: int = 2000, seed: int = 42) -> list[dict]:
+    """A deterministic synthetic qag_employees table with the production column set."""
+    rng = random.Random(seed)
+    start = date(2000, 1, 1)
+    rows = []
+    for i in range(count):
+        (first_ar, first_en), (father_ar, father_en) = rng.choice(FIRST_NAMES), rng.choice(FIRST_NAMES)
+        family_ar, family_en = rng.choice(FAMILY_NAMES)
+        rank, base_salary = rng.choice(RANKS)
+        enlistment = start + timedelta(days=rng.randint(0, 8000))
+        total_loan = rng.choice([0, 0, 0, rng.randint(10, 200) * 1000])
+        row = {
+            "id": i + 1,
+            "military_id": 100000 + i,
+            "full_name": f"{first_ar} {father_ar} {family_ar}",
+            "full_name_en": f"{first_en} {father_en} {family_en}",
+            "rank": rank,
+            "marital_status": rng.choice(MARITAL_STATUSES),
+            "base_salary": base_salary + rng.randint(0, 20) * 100,
+            "total_loan": total_loan,
+            "remaining_loan": rng.randint(0, total_loan) if total_loan else 0,
+            "retirement_deduction": rng.randint(3, 9) * 100,
+            "position": rng.choice(POSITIONS),
+            "enlistment_date": enlistment.isoformat(),
+            "birth_date": (enlistment - timedelta(days=rng.randint(18 * 365, 30 * 365))).isoformat(),
+            "annual_leave_balance": rng.randint(0, 60),
+            "grant_leave_balance": rng.randint(0, 15),
+            "emergency_leave_balance": rng.randint(0, 7),
+            "last_leave_date": (date(2025, 1, 1) + timedelta(days=rng.randint(0, 300))).isoformat(),
+            "last_leave_duration_days": rng.randint(1, 45),
+            "created_at": (datetime(2025, 1, 1, tzinfo=timezone.utc) + timedelta(seconds=i)).isoformat(),
+        }
+        for allowance in ALLOWANCES:
+            row[allowance] = rng.choice([0, rng.randint(2, 60) * 100])
+        rows.append(row)
+    return rows
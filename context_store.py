@@ -0,0 +1,144 @@
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from shared_state import SharedState, shared_state
+
+# Only these fields are kept from a result row; enough to resolve "he"/"she"/"them" in a follow-up.
+REFERENCE_FIELDS = ("military_id", "full_name", "full_name_en")
+
+# Rough per-reference bookkeeping overhead (dict + key strings) added to the text size.
+REFERENCE_OVERHEAD_BYTES = 200
+
+
+def make_references(rows: list[dict], max_refs: int) -> list[dict]:
+    """Reduces result rows to compact references (military_id plus display names)."""
+    refs = []
+    for row in rows[:max_refs]:
+        ref = {field: row.get(field) for field in REFERENCE_FIELDS if row.get(field) is not None}
+        if ref:
+            refs.append(ref)
+    return refs
+
+
+def _estimate_size(refs: list[dict]) -> int:
+    return sum(
+        REFERENCE_OVERHEAD_BYTES + sum(len(str(value).encode("utf-8")) for value in ref.values())
+        for ref in refs
+    )
+
+
+class ContextStore:
+    """
+    Per-session conversation context with an idle TTL and LRU eviction under a global memory cap:
+    reading a session counts as using it, in memory and in the shared store alike.
+    Each session holds only compact references to the rows of its last list answer,
+    so concurrent users no longer overwrite each other and large answers can't pin the table in memory.
+    With a shared state store, sessions live there so any worker process can answer a follow-up.
+    """
+
+    def __init__(self, max_sessions: int = 10000, ttl_seconds: float = 1800,
+                 max_bytes: int = 16 * 1024 * 1024, max_refs_per_session: int = 200,
+                 shared: SharedState | None = None):
+        self.shared = shared
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.max_refs_per_session = max_refs_per_session
+        self._sessions: OrderedDict[str, tuple[float, int, list[dict]]] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    async def get(self, session_id: str) -> list[dict] | None:
+        if self.shared is not None:
+            # SQLite calls can wait on another worker's write, so they run off the event loop.
+            return await asyncio.to_thread(self.shared.get, "context", session_id, self.ttl_seconds, True)
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return None
+            stored_at, size, refs = entry
+            now = time.monotonic()
+            if now - stored_at > self.ttl_seconds:
+                self._remove(session_id)
+                return None
+            self._sessions[session_id] = (now, size, refs)
+            self._sessions.move_to_end(session_id)
+            return list(refs)
+
+    async def set(self, session_id: str, rows: list[dict]) -> None:
+        refs = make_references(rows, self.max_refs_per_session)
+        if not refs:
+            await self.clear(session_id)
+            return
+        size = _estimate_size(refs)
+        if self.shared is not None:
+            await asyncio.to_thread(self._set_shared, session_id, refs, size)
+            return
+        with self._lock:
+            self._remove(session_id)
+            self._sessions[session_id] = (time.monotonic(), size, refs)
+            self._bytes += size
+            self._evict()
+
+    def _set_shared(self, session_id: str, refs: list[dict], size: int) -> None:
+        self.shared.set("context", session_id, refs, size=size)
+        evicted = self.shared.evict("context", self.ttl_seconds, self.max_sessions, self.max_bytes)
+        with self._lock:
+            self.evictions += evicted
+
+    async def clear(self, session_id: str) -> None:
+        if self.shared is not None:
+            await asyncio.to_thread(self.shared.delete, "context", session_id)
+            return
+        with self._lock:
+            self._remove(session_id)
+
+    def clear_all(self) -> None:
+        if self.shared is not None:
+            self.shared.clear("context")
+        with self._lock:
+            self._sessions.clear()
+            self._bytes = 0
+
+    def _remove(self, session_id: str) -> None:
+        entry = self._sessions.pop(session_id, None)
+        if entry is not None:
+            self._bytes -= entry[1]
+
+    def _evict(self) -> None:
+        now = time.monotonic()
+        # Oldest-used sessions are at the front; drop expired ones first, then whatever is over the caps.
+        while self._sessions:
+            session_id, (stored_at, _, _) = next(iter(self._sessions.items()))
+            expired = now - stored_at > self.ttl_seconds
+            if not (expired or len(self._sessions) > self.max_sessions or self._bytes > self.max_bytes):
+                break
+            self._remove(session_id)
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        shared_counts = self.shared.stats("context") if self.shared is not None else None
+        with self._lock:
+            sessions, size = shared_counts or (len(self._sessions), self._bytes)
+            return {
+                "sessions": sessions,
+                "shared": self.shared is not None,
+                "max_sessions": self.max_sessions,
+                "bytes": size,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl_seconds,
+                "evictions": self.evictions,
+            }
+
+
+context_store = ContextStore(
+    max_sessions=int(os.getenv("CONTEXT_MAX_SESSIONS", "10000")),
+    ttl_seconds=float(os.getenv("CONTEXT_TTL_SECONDS", "1800")),
+    max_bytes=int(os.getenv("CONTEXT_MAX_BYTES", str(16 * 1024 * 1024))),
+    max_refs_per_session=int(os.getenv("CONTEXT_MAX_REFS", "200")),
+    shared=shared_state,
+)
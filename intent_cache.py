@@ -0,0 +1,114 @@
+import asyncio
+import copy
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from text_utils import normalize_text
+from shared_state import SharedState, shared_state
+
+
+class IntentCache:
+    """
+    A bounded LRU cache with a TTL for classified intents.
+    Keys combine the normalized query text with a fingerprint of the context summary,
+    so the same question asked with a different conversation context is a different entry.
+    With a shared state store, entries live there so every worker process reuses them.
+    A disabled cache misses every lookup and stores nothing.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 3600, shared: SharedState | None = None,
+                 enabled: bool = True):
+        self.enabled = enabled
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.shared = shared
+        self._entries: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(query: str, context_summary: str = "") -> str:
+        context_fingerprint = hashlib.sha1(context_summary.encode("utf-8")).hexdigest()[:16]
+        return f"{normalize_text(query)}|{context_fingerprint}"
+
+    async def get(self, key: str) -> dict | None:
+        if not self.enabled:
+            with self._lock:
+                self.misses += 1
+            return None
+        if self.shared is not None:
+            # SQLite calls can wait on another worker's write, so they run off the event loop.
+            value = await asyncio.to_thread(self.shared.get, "intent", key, self.ttl_seconds)
+            with self._lock:
+                if value is None:
+                    self.misses += 1
+                else:
+                    self.hits += 1
+            return value
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            stored_at, value = entry
+            if time.monotonic() - stored_at > self.ttl_seconds:
+                del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        # Callers may mutate the parsed JSON, so never hand out the cached object itself.
+        return copy.deepcopy(value)
+
+    async def set(self, key: str, value: dict) -> None:
+        if not self.enabled:
+            return
+        if self.shared is not None:
+            await asyncio.to_thread(self._set_shared, key, value)
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic(), copy.deepcopy(value))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _set_shared(self, key: str, value: dict) -> None:
+        self.shared.set("intent", key, value)
+        self.shared.evict("intent", self.ttl_seconds, max_entries=self.max_entries)
+
+    def clear(self) -> None:
+        if self.shared is not None:
+            self.shared.clear("intent")
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict:
+        size = self.shared.stats("intent")[0] if self.shared is not None else None
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries) if size is None else size,
+                "enabled": self.enabled,
+                "shared": self.shared is not None,
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+INTENT_CACHE_ENABLED = os.getenv("INTENT_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+
+intent_cache = IntentCache(
+    max_entries=int(os.getenv("INTENT_CACHE_SIZE", "1024")),
+    ttl_seconds=float(os.getenv("INTENT_CACHE_TTL_SECONDS", "3600")),
+    shared=shared_state,
+    enabled=INTENT_CACHE_ENABLED,
+)
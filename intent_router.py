@@ -0,0 +1,219 @@
+import re
+import threading
+
+from name_index import name_index
+from text_utils import detect_language, fold_text, normalize_text
+
+# Columns that can be ranked with the "ordered_list" intent, with their English and Arabic aliases.
+ORDERABLE_COLUMNS = {
+    "base_salary": ["base salary", "salary", "الراتب الأساسي", "الراتب"],
+    "civil_clothing_allowance": ["civil clothing allowance", "بدل الملابس المدنية"],
+    "military_clothing_allowance": ["military clothing allowance", "بدل الملابس العسكرية"],
+    "housing_allowance": ["housing allowance", "بدل السكن"],
+    "phone_allowance": ["phone allowance", "بدل الهاتف"],
+    "unit_allowance": ["unit allowance", "بدل الوحدة"],
+    "social_allowance": ["social allowance", "البدل الاجتماعي", "بدل اجتماعي"],
+    "transport_allowance": ["transport allowance", "transportation allowance", "بدل النقل", "بدل المواصلات"],
+    "position_allowance": ["position allowance", "بدل المنصب"],
+    "specialty_allowance": ["specialty allowance", "بدل التخصص"],
+    "risk_allowance": ["risk allowance", "بدل الخطر", "بدل المخاطر"],
+    "total_loan": ["total loan", "loan", "إجمالي القرض", "القرض"],
+    "remaining_loan": ["remaining loan", "القرض المتبقي"],
+    "retirement_deduction": ["retirement deduction", "استقطاع التقاعد"],
+    "annual_leave_balance": ["annual leave balance", "annual leave", "رصيد الإجازة السنوية"],
+    "grant_leave_balance": ["grant leave balance", "رصيد إجازة المنحة"],
+    "emergency_leave_balance": ["emergency leave balance", "رصيد الإجازة الطارئة"],
+    "last_leave_duration_days": ["last leave duration", "leave duration", "مدة آخر إجازة", "مدة الإجازة"],
+}
+
+# Columns that make sense as a "count by" dimension.
+DIMENSION_COLUMNS = {
+    "rank": ["rank", "ranks", "الرتبة", "الرتب"],
+    "marital_status": ["marital status", "الحالة الاجتماعية"],
+    "position": ["position", "positions", "المنصب", "المناصب"],
+}
+
+PRONOUNS = {
+    "him", "her", "them", "he", "she", "they", "it", "this", "that", "this person", "that person",
+    "everyone", "everybody", "all", "all of them", "هو", "هي", "هم", "الجميع", "الكل",
+}
+
+# A "details of <name>" tail is only taken as a name when it looks like one: a few words,
+# no digits, and none of the words that signal a ranking, a group, a pronoun reference,
+# or a rank or marital-status value.
+MAX_NAME_WORDS = 5
+NON_NAME_WORDS = {
+    "the", "a", "an", "all", "each", "every", "any", "some", "with", "who", "whose", "which", "what", "where",
+    "highest", "lowest", "top", "bottom", "most", "least", "best", "worst", "largest", "smallest", "by", "per",
+    "employee", "employees", "staff", "people", "person", "personnel", "everyone", "everybody", "record", "records",
+    "his", "her", "their", "my", "our", "your", "its", "him", "them", "he", "she", "they", "this", "that", "these",
+    "those", "salary", "salaries", "loan", "loans", "allowance", "allowances", "leave", "rank", "ranks",
+    "اعلي", "اقل", "كل", "جميع", "لكل", "حسب", "الموظفين", "الموظف", "موظف", "موظفين", "الذي", "التي", "هذا", "هذه",
+    "private", "corporal", "sergeant", "lieutenant", "captain", "major", "colonel", "brigadier", "general", "marshal",
+    "married", "single", "divorced", "widowed", "widow", "widower",
+    "جندي", "عريف", "رقيب", "ملازم", "نقيب", "مقدم", "عقيد", "عميد", "لواء", "فريق",
+    "متزوج", "متزوجه", "اعزب", "عزباء", "مطلق", "مطلقه", "ارمل", "ارمله",
+}
+
+
+def _alias_lookup(columns: dict[str, list[str]]) -> dict[str, str]:
+    lookup = {}
+    for column, aliases in columns.items():
+        for alias in [column, *aliases]:
+            lookup[normalize_text(alias)] = column
+    return lookup
+
+
+ORDERABLE_LOOKUP = _alias_lookup(ORDERABLE_COLUMNS)
+DIMENSION_LOOKUP = _alias_lookup(DIMENSION_COLUMNS)
+# Column names and their aliases ("salary", "housing", "الراتب") are never part of a name either.
+NON_NAME_WORDS = {normalize_text(word) for word in NON_NAME_WORDS} | {
+    word for alias in [*ORDERABLE_LOOKUP, *DIMENSION_LOOKUP] for word in alias.replace("_", " ").split()
+}
+NAME_WORD = re.compile(r"^[^\W\d_]+(?:['.-][^\W\d_]+)*\.?$")
+
+
+def _looks_like_name(name: str) -> bool:
+    words = normalize_text(name).split()
+    return (
+        0 < len(words) <= MAX_NAME_WORDS
+        and all(NAME_WORD.match(word) for word in words)
+        and not any(word in NON_NAME_WORDS for word in words)
+    )
+
+# All patterns run against normalize_text() output, so Arabic alternatives are written
+# with unified letter forms (e.g. "اعلي" for "أعلى", "الرتبه" for "الرتبة").
+PATTERNS = {
+    "en": {
+        "total_count": [
+            re.compile(r"^(?:how many|total number of|number of|count of|count all) (?:the )?(?:employees|staff|people|personnel|records)"
+                       r"(?: are there| do we have| are there in total| in total| total)?$"),
+            re.compile(r"^(?:total )?(?:employee|staff) (?:count|headcount)$"),
+        ],
+        "ordered_list": [
+            re.compile(r"^(?:show |list |get |give )?(?:me )?(?:the )?(?P<direction>top|highest|bottom|lowest) (?P<limit>\d+)"
+                       r" (?:employees |people |staff )?(?:by|on|for) (?:the )?(?P<column>[\w ]+)$"),
+            re.compile(r"^who (?:has|have|gets|earns) the (?P<direction>highest|lowest) (?P<column>[\w ]+)$"),
+        ],
+        "aggregate_count": [
+            re.compile(r"^(?:count|headcount|number of employees|how many employees|employee count|employees)"
+                       r" (?:by|per|for each|in each|grouped by) (?P<dimension>[\w ]+)$"),
+        ],
+        "filter": [
+            re.compile(r"^(?:show |get |give |display )?(?:me )?(?:all )?(?:the )?(?:details|info|information|profile)"
+                       r" (?:of|for|about|on) (?P<name>.+)$"),
+        ],
+    },
+    "ar": {
+        "total_count": [
+            re.compile(r"^(?:كم|ما|ما هو|ما هي)? ?(?:اجمالي )?عدد (?:جميع |كل )?الموظفين(?: الكلي| الاجمالي| في المجموع)?$"),
+            re.compile(r"^كم موظف(?: لدينا| يوجد| هناك)?$"),
+        ],
+        "ordered_list": [
+            re.compile(r"^(?:اعرض |اظهر |عرض )?(?:لي )?(?P<direction>اعلي|اقل) (?P<limit>\d+) (?:موظفين |موظف )?(?:حسب|من حيث|في) (?P<column>.+)$"),
+            re.compile(r"^من (?:لديه|لدية|عنده) (?P<direction>اعلي|اقل) (?P<column>.+)$"),
+        ],
+        "aggregate_count": [
+            re.compile(r"^(?:كم )?عدد الموظفين (?:حسب|لكل|في كل|بحسب) (?P<dimension>.+)$"),
+        ],
+        "filter": [
+            re.compile(r"^(?:اعرض |اظهر |عرض )?(?:لي )?(?:كل )?(?:تفاصيل|معلومات|بيانات)(?: عن)? (?P<name>.+)$"),
+        ],
+    },
+}
+
+ASCENDING_WORDS = {"bottom", "lowest", "اقل"}
+
+
+class FastPathRouter:
+    """
+    Resolves common, unambiguous queries locally with anchored patterns.
+    Returns the same intent JSON the LLM would, or None when it is not confident,
+    in which case the caller falls back to the LLM.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.lookups = 0
+        self.hits: dict[str, int] = {}
+
+    def route(self, query: str, lang: str | None = None) -> dict | None:
+        lang = lang or detect_language(query)
+        result = self._match(query, lang)
+        with self._lock:
+            self.lookups += 1
+            if result is not None:
+                self.hits[result["intent"]] = self.hits.get(result["intent"], 0) + 1
+        return result
+
+    def _match(self, query: str, lang: str) -> dict | None:
+        text = normalize_text(query)
+        for intent, patterns in PATTERNS.get(lang, PATTERNS["en"]).items():
+            for pattern in patterns:
+                match = pattern.match(text)
+                if match:
+                    parsed = self._build(intent, match, fold_text(query))
+                    if parsed is not None:
+                        return parsed
+        return None
+
+    @staticmethod
+    def _build(intent: str, match: re.Match, folded_query: str) -> dict | None:
+        if intent == "total_count":
+            return {"intent": "total_count"}
+
+        if intent == "ordered_list":
+            column = ORDERABLE_LOOKUP.get(match.group("column").strip())
+            if column is None:
+                return None
+            limit = int(match.group("limit")) if "limit" in match.groupdict() else 1
+            if limit <= 0:
+                return None
+            return {
+                "intent": "ordered_list",
+                "order_by_column": column,
+                "ascending": match.group("direction") in ASCENDING_WORDS,
+                "limit": limit,
+            }
+
+        if intent == "aggregate_count":
+            dimension = DIMENSION_LOOKUP.get(match.group("dimension").strip())
+            if dimension is None:
+                return None
+            return {"intent": "aggregate_count", "dimension": dimension}
+
+        if intent == "filter":
+            # The letter mapping in normalize_text is one-to-one, so the name can be sliced out of
+            # the folded query: case, diacritics and spacing are folded, but letter forms are kept.
+            start, end = match.span("name")
+            name = folded_query[start:end].strip()
+            if not name or normalize_text(name) in PRONOUNS or not _looks_like_name(name):
+                return None
+            column = "full_name" if detect_language(name) == "ar" else "full_name_en"
+            if name_index.ready and not name_index.search(name, fields=[column], limit=1, fuzzy=False):
+                # Not anyone's name; it may be a position or other value, so let the LLM decide.
+                return None
+            return {"intent": "filter", "conditions": [{"column": column, "operator": "ilike", "value": name}]}
+
+        return None
+
+    def stats(self) -> dict:
+        with self._lock:
+            total_hits = sum(self.hits.values())
+            return {
+                "lookups": self.lookups,
+                "hits": total_hits,
+                "fallbacks": self.lookups - total_hits,
+                "hit_rate": round(total_hits / self.lookups, 4) if self.lookups else 0.0,
+                "hit_rate_by_intent": {
+                    intent: round(count / self.lookups, 4) for intent, count in sorted(self.hits.items())
+                },
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self.lookups = 0
+            self.hits = {}
+
+
+fast_path_router = FastPathRouter()
@@ -1,95 +1,281 @@
+import asyncio
+import importlib
 import os
 import json
+import logging
+from typing import TYPE_CHECKING
 from dotenv import load_dotenv
-import openai
+from intent_cache import intent_cache
+from intent_router import fast_path_router
+from query_plan import COLUMN_TYPES, PlanError, compile_intent
+import threading
+import time
+from metrics import stage_timer, LLM_TOKENS, LLM_ERRORS
+
+if TYPE_CHECKING:
+    import openai
 
 # --- Setup ---
 load_dotenv()
-client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+logger = logging.getLogger(__name__)
+OPENAI_TIMEOUT_SECONDS = float(os.getenv("OPENAI_TIMEOUT_SECONDS", "30"))
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "100"))
+
+# Tiered routing: the small model answers first and the large one is only used when
+# the small model's JSON fails validation or it marks its answer "confidence": "low".
+LLM_SMALL_MODEL = os.getenv("LLM_SMALL_MODEL", "gpt-4o-mini")
+LLM_LARGE_MODEL = os.getenv("LLM_LARGE_MODEL", "gpt-4-turbo")
+LLM_TIERED_ROUTING = os.getenv("LLM_TIERED_ROUTING", "true").lower() in ("1", "true", "yes")
+
+# Limits on the previous-answer summary that is sent with every follow-up question.
+CONTEXT_SUMMARY_MAX_NAMES = int(os.getenv("CONTEXT_SUMMARY_MAX_NAMES", "20"))
+CONTEXT_SUMMARY_MAX_CHARS = int(os.getenv("CONTEXT_SUMMARY_MAX_CHARS", "1000"))
+
+# Built on first use (by the startup warm-up or the first request) rather than at import, and then
+# shared so all requests use one keep-alive connection pool.
+client: "openai.AsyncOpenAI | None" = None
+# Requests that arrive while the client is being built wait for it instead of building their own pool.
+_connect_lock: asyncio.Lock | None = None
+
+
+async def connect_openai() -> "openai.AsyncOpenAI":
+    global client, _connect_lock
+    if client is not None:
+        return client
+    if _connect_lock is None:
+        _connect_lock = asyncio.Lock()
+    async with _connect_lock:
+        if client is None:
+            # The openai package takes most of a second to import, so keep it off the event loop.
+            openai = await asyncio.to_thread(importlib.import_module, "openai")
+            import httpx
+
+            http_client = httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=OPENAI_MAX_CONNECTIONS, max_keepalive_connections=OPENAI_MAX_CONNECTIONS),
+                timeout=OPENAI_TIMEOUT_SECONDS,
+            )
+            client = openai.AsyncOpenAI(
+                api_key=os.getenv("OPENAI_API_KEY"),
+                http_client=http_client,
+                timeout=OPENAI_TIMEOUT_SECONDS,
+            )
+    return client
+
+
+async def close_openai() -> None:
+    global client
+    if client is not None:
+        await client.close()
+        client = None
+
+
+async def warm_up_openai() -> None:
+    """Connects and opens a pooled connection with a free model lookup, so the first query skips the handshake."""
+    llm = await connect_openai()
+    await llm.models.retrieve(LLM_SMALL_MODEL)
 
 
-def parse_query_to_filter(query: str, last_context: dict | None = None) -> dict:
+def build_context_prompt(last_context: list[dict] | None) -> str:
     """
-    Classifies a query into an intent. If 'last_context' is provided, it uses it
-    to understand follow-up questions for a single-user demo.
+    Dynamically builds the context part of the prompt from the references of the last answer.
+    The summary is capped so prompt size (and LLM latency) doesn't grow with the previous result count.
     """
-    
-    # Dynamically build the context part of the prompt
     context_prompt = "No previous context is available. This is a new query."
     if last_context:
         # Create a simplified summary of the last answer for the LLM
-        summary_list = [r.get("full_name") for r in last_context.get("raw_results", [])]
+        names = [ref.get("full_name") or ref.get("full_name_en") for ref in last_context]
+        names = [name for name in names if name]
+        summary_list, length = [], 0
+        for name in names[:CONTEXT_SUMMARY_MAX_NAMES]:
+            length += len(name) + 4
+            if length > CONTEXT_SUMMARY_MAX_CHARS:
+                break
+            summary_list.append(name)
         if summary_list:
-            context_prompt = f"The previous query returned a list of these people: {summary_list}. The user might be asking a follow-up question about one of them."
-    
-    system_prompt = f"""
-You are a query analysis engine for a single-user demo. You will receive the latest user query and, optionally, the context from the last answer.
-Your job is to classify the user's query into an intent and extract all parameters into a valid JSON object.
-If the query is a follow-up (e.g., uses 'he', 'she', 'it', 'their'), you MUST use the provided context to resolve it.
-
-# CONTEXT FROM PREVIOUS TURN
-{context_prompt}
-
-# EXAMPLE OF CONTEXT RESOLUTION
-- CONTEXT: The previous query returned ['Salman Al Hajri', 'Nawaf Al Naimi']
-- CURRENT QUERY: "what is his rank?"
-- YOUR THOUGHT PROCESS: The query is ambiguous as "his" could refer to multiple people. I must ask for clarification.
-- YOUR JSON OUTPUT: {{"intent": "unsupported", "reason": "Which person are you asking about? Please specify a name from the list."}}
-
-- CONTEXT: The previous query returned ['Salman Al Hajri']
-- CURRENT QUERY: "what is his rank?"
-- YOUR THOUGHT PROCESS: "His" clearly refers to 'Salman Al Hajri'. The user wants a specific field, 'rank'. I will use the 'filter' intent, resolve the context to a condition on 'full_name', and specify the 'rank' column in the "columns" key to fetch only that data. I will also include 'full_name' for context.
-- YOUR JSON OUTPUT: {{"intent": "filter", "conditions": [{{"column": "full_name", "operator": "eq", "value": "Salman Al Hajri"}}], "columns": ["rank", "full_name"]}}
-
-# EXAMPLE OF COMPLEX QUERY
+            context_prompt = f"The previous query returned a list of these people: {summary_list}"
+            if len(names) > len(summary_list):
+                context_prompt += f" (and {len(names) - len(summary_list)} more not shown)"
+            context_prompt += ". The user might be asking a follow-up question about one of them."
+    return context_prompt
+
+
+EMPLOYEE_COLUMNS = list(COLUMN_TYPES)
+
+# The static part of the prompt. It never changes between calls, so it forms a stable prefix the
+# provider can cache; the per-turn context is sent after it in its own message.
+SYSTEM_PROMPT = """You are a query analysis engine. You receive the latest user query and, optionally, context from the last answer.
+Classify the query into an intent and extract all parameters into one valid JSON object.
+If the query is a follow-up (e.g. 'he', 'she', 'it', 'their'), you MUST resolve it using the context.
+
+# CONTEXT RESOLUTION EXAMPLES
+- CONTEXT: ['Salman Al Hajri', 'Nawaf Al Naimi'] | QUERY: "what is his rank?"
+  "his" is ambiguous, so ask for clarification:
+  {"intent": "unsupported", "reason": "Which person are you asking about? Please specify a name from the list."}
+- CONTEXT: ['Salman Al Hajri'] | QUERY: "what is his rank?"
+  "his" is Salman Al Hajri; request only the needed columns plus the name:
+  {"intent": "filter", "conditions": [{"column": "full_name", "operator": "eq", "value": "Salman Al Hajri"}], "columns": ["rank", "full_name"]}
 - QUERY: "Who has the highest total compensation?"
-- THOUGHT PROCESS: The user is asking for a complex calculation (sum of salary and allowances) that requires a special tool. I will use the `highest_total_compensation` intent.
-- JSON OUTPUT: {{"intent": "highest_total_compensation", "limit": 1}}
-
-
-# AVAILABLE INTENTS AND THEIR JSON FORMATS
-1.  **intent: "filter"** - For searching for records.
-    `{{"intent": "filter", "conditions": [...], "columns": [...]}}`
-2.  **intent: "aggregate_count"** - For counting records grouped by a category.
-    `{{"intent": "aggregate_count", "dimension": "..."}}`
-3.  **intent: "aggregate_metric"** - For calculating sum, avg, min, or max, grouped by a category.
-    `{{"intent": "aggregate_metric", "dimension": "...", "metric": "...", "metric_column": "..."}}`
-4.  **intent: "ordered_list"** - For finding top/bottom records based on a SINGLE, EXISTING column.
-    `{{"intent": "ordered_list", "order_by_column": "...", "ascending": true|false, "limit": integer}}`
-5.  **intent: "highest_total_compensation"** - **USE ONLY** for questions about "total compensation", "total pay", or "salary plus allowances". This calculates the sum of all salary and allowance fields.
-    `{{"intent": "highest_total_compensation", "limit": integer}}`
-6.  **intent: "conditional_aggregate_count"** - For filtered counting.
-    `{{"intent": "conditional_aggregate_count", "dimension": "...", "conditions": [...]}}`
-7.  **intent: "find_top_group"** - For finding the single best/worst group based on an aggregation of an EXISTING column.
-    `{{"intent": "find_top_group", "dimension": "...", "metric_column": "...", "metric": "...", "ranking": "highest|lowest"}}`
-8.  **intent: "total_count"** - For getting the total number of all records.
-    `{{"intent": "total_count"}}`
-9.  **intent: "unsupported"** - When the query cannot be answered.
-    `{{"intent": "unsupported", "reason": "A brief explanation."}}`
-
-# AVAILABLE COLUMNS
-- For name searches, use 'full_name' for Arabic and 'full_name_en' for English.
-- [military_id, full_name, rank, marital_status, base_salary, civil_clothing_allowance, military_clothing_allowance, housing_allowance, phone_allowance, unit_allowance, social_allowance, transport_allowance, position_allowance, specialty_allowance, risk_allowance, total_loan, remaining_loan, retirement_deduction, position, enlistment_date, birth_date, annual_leave_balance, grant_leave_balance, emergency_leave_balance, last_leave_date, last_leave_duration_days, full_name_en]
+  Needs the sum of salary and allowances, which only a dedicated intent can compute:
+  {"intent": "highest_total_compensation", "limit": 1}
+
+# INTENTS
+1. filter - search records: {"intent": "filter", "conditions": [{"column": ..., "operator": ..., "value": ...}], "columns": [...]}
+2. aggregate_count - count grouped by a category: {"intent": "aggregate_count", "dimension": "..."}
+3. aggregate_metric - sum/avg/min/max grouped by a category: {"intent": "aggregate_metric", "dimension": "...", "metric": "...", "metric_column": "..."}
+4. ordered_list - top/bottom records by ONE existing column: {"intent": "ordered_list", "order_by_column": "...", "ascending": true|false, "limit": integer}
+5. highest_total_compensation - ONLY for "total compensation", "total pay" or "salary plus allowances": {"intent": "highest_total_compensation", "limit": integer}
+6. conditional_aggregate_count - filtered counting: {"intent": "conditional_aggregate_count", "dimension": "...", "conditions": [...]}
+7. find_top_group - the single best/worst group by an aggregation of an existing column: {"intent": "find_top_group", "dimension": "...", "metric_column": "...", "metric": "...", "ranking": "highest|lowest"}
+8. total_count - total number of records: {"intent": "total_count"}
+9. unsupported - the query cannot be answered: {"intent": "unsupported", "reason": "A brief explanation."}
+
+# COLUMNS
+Use 'full_name' for Arabic name searches and 'full_name_en' for English ones.
+""" + ", ".join(EMPLOYEE_COLUMNS) + """
 
 # RULES
-- ALWAYS respond with a valid JSON object.
+- ALWAYS respond with a single valid JSON object.
 - For text comparisons, prefer the `ilike` operator over `eq`.
-- DO NOT invent new column names like 'total_compensation'. Use the specific intents provided for complex calculations.
+- DO NOT invent column names like 'total_compensation'; use the dedicated intents for complex calculations.
+- Add "confidence": "low" only when you are unsure which intent, columns or values the query needs.
+  Asking for clarification or declining an off-topic question is a confident answer.
 """
-    
+
+
+class TierStats:
+    """Per-model call counts, tokens and latency, and what the small tier saved us."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.tiers: dict[str, dict] = {}
+        self.resolved_by_small = 0
+        self.escalations = 0
+
+    def record_call(self, tier: str, model: str, seconds: float, usage) -> None:
+        with self._lock:
+            stats = self.tiers.setdefault(tier, {
+                "model": model, "calls": 0, "seconds": 0.0,
+                "prompt_tokens": 0, "completion_tokens": 0, "cached_prompt_tokens": 0,
+            })
+            stats["calls"] += 1
+            stats["seconds"] += seconds
+            if usage is not None:
+                stats["prompt_tokens"] += usage.prompt_tokens or 0
+                stats["completion_tokens"] += usage.completion_tokens or 0
+                details = getattr(usage, "prompt_tokens_details", None)
+                stats["cached_prompt_tokens"] += getattr(details, "cached_tokens", 0) or 0
+
+    def record_outcome(self, escalated: bool) -> None:
+        with self._lock:
+            if escalated:
+                self.escalations += 1
+            else:
+                self.resolved_by_small += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            tiers = {tier: dict(values) for tier, values in self.tiers.items()}
+            small, large = tiers.get("small"), tiers.get("large")
+            saved_seconds = saved_tokens = None
+            # Savings are estimated against the large model's observed averages.
+            if small and large and large["calls"]:
+                avg_large_seconds = large["seconds"] / large["calls"]
+                avg_small_seconds = small["seconds"] / small["calls"]
+                saved_seconds = round(self.resolved_by_small * (avg_large_seconds - avg_small_seconds), 3)
+            if small:
+                saved_tokens = round(
+                    self.resolved_by_small * (small["prompt_tokens"] + small["completion_tokens"]) / small["calls"]
+                )
+            for values in tiers.values():
+                values["avg_latency_seconds"] = round(values.pop("seconds") / values["calls"], 4) if values["calls"] else 0.0
+            return {
+                "tiers": tiers,
+                "resolved_by_small": self.resolved_by_small,
+                "escalations": self.escalations,
+                "estimated_latency_saved_seconds": saved_seconds,
+                "large_model_tokens_avoided": saved_tokens,
+            }
+
+
+tier_stats = TierStats()
+
+
+async def _classify_with(tier: str, model: str, messages: list[dict]) -> tuple[dict | None, str | None]:
+    """One chat-completions call; returns the parsed JSON or the reason it couldn't be used."""
+    started = time.perf_counter()
+    try:
+        llm = client if client is not None else await connect_openai()
+        with stage_timer("llm_call", model=model):
+            completion = await llm.chat.completions.create(
+                model=model,
+                messages=messages,
+                temperature=0,
+                response_format={"type": "json_object"}
+            )
+    except Exception as e:
+        LLM_ERRORS.inc(model=model)
+        return None, str(e)
+    usage = completion.usage
+    tier_stats.record_call(tier, model, time.perf_counter() - started, usage)
+    if usage is not None:
+        LLM_TOKENS.inc(usage.prompt_tokens, model=model, type="prompt")
+        LLM_TOKENS.inc(usage.completion_tokens, model=model, type="completion")
+        cached = getattr(getattr(usage, "prompt_tokens_details", None), "cached_tokens", 0) or 0
+        if cached:
+            LLM_TOKENS.inc(cached, model=model, type="cached_prompt")
+    try:
+        parsed_json = json.loads(completion.choices[0].message.content)
+    except (TypeError, ValueError) as e:
+        LLM_ERRORS.inc(model=model)
+        return None, f"invalid JSON: {e}"
+    if tier == "small" and isinstance(parsed_json, dict) and str(parsed_json.get("confidence", "")).lower() == "low":
+        return None, "the small model was not confident"
+    # Answers that don't compile against the schema count as failures, so they can be escalated.
+    try:
+        return compile_intent(parsed_json), None
+    except PlanError as e:
+        LLM_ERRORS.inc(model=model)
+        return None, str(e)
+
+
+async def parse_query_to_filter(query: str, last_context: list[dict] | None = None, lang: str | None = None) -> dict:
+    """
+    Classifies a query into an intent. If 'last_context' (the session's references from
+    the last list answer) is provided, it uses it to understand follow-up questions.
+    Common, unambiguous queries are resolved locally and never reach the LLM.
+    """
+    fast_path = fast_path_router.route(query, lang)
+    if fast_path is not None:
+        return fast_path
+
+    context_prompt = build_context_prompt(last_context)
+
+    # Identical questions asked with the same context skip the LLM entirely.
+    cache_key = intent_cache.make_key(query, context_prompt)
+    cached = await intent_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
     messages = [
-        {"role": "system", "content": system_prompt},
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "system", "content": f"# CONTEXT FROM PREVIOUS TURN\n{context_prompt}"},
         {"role": "user", "content": f"Latest Query: {query}"}
     ]
 
-    try:
-        completion = client.chat.completions.create(
-            model="gpt-4-turbo",
-            messages=messages,
-            temperature=0,
-            response_format={"type": "json_object"}
-        )
-        return json.loads(completion.choices[0].message.content)
-    except Exception as e:
-        print(f"LLM parsing error: {e}")
-        return {"intent": "unsupported", "reason": f"An error occurred while analyzing the query: {e}"}
+    parsed_json, problem = None, None
+    if LLM_TIERED_ROUTING:
+        # Its "unsupported" answers (clarifications, off-topic questions) are final unless it isn't confident.
+        parsed_json, problem = await _classify_with("small", LLM_SMALL_MODEL, messages)
+        if parsed_json is None:
+            logger.debug("Escalating to %s: %s", LLM_LARGE_MODEL, problem)
+        tier_stats.record_outcome(escalated=parsed_json is None)
+
+    if parsed_json is None:
+        parsed_json, problem = await _classify_with("large", LLM_LARGE_MODEL, messages)
+        if parsed_json is None:
+            logger.error("LLM parsing error: %s", problem)
+            return {"intent": "unsupported", "reason": f"An error occurred while analyzing the query: {problem}"}
+
+    # Only successful classifications are cached; errors should be retried next time.
+    await intent_cache.set(cache_key, parsed_json)
+    return parsed_json
@@ -1,49 +1,259 @@
+import time
+
+# Import time is measured from here, so it covers every module the app loads before it can serve.
+_import_started = time.perf_counter()
+
+import asyncio
 import json
-from fastapi import FastAPI
+import logging
+import os
+import uuid
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
-from llm_parser import parse_query_to_filter
-from supabase_client import supabase
+from llm_parser import parse_query_to_filter, warm_up_openai, close_openai, tier_stats
+from intent_cache import intent_cache
+from result_cache import result_cache
+from context_store import context_store
+from shared_state import SHARED_STATE_POLL_SECONDS, shared_state
+from intent_router import fast_path_router
+from text_utils import detect_language, normalize_text
+from supabase_client import warm_up_supabase, close_async_supabase
+from query_engine import cursor_plan, run_intent
+from query_plan import PlanError, compile_intent, plan_cache_stats
+import snapshot_engine
+from name_index import name_index, refresh_name_index, name_index_refresh_loop
+from metrics import stage_timer, render_metrics, REQUESTS, REQUEST_ERRORS, REQUEST_SECONDS
+
+# Leveled logging replaces the old debug prints; set LOG_LEVEL=WARNING in production to silence per-request logs.
+logging.basicConfig(
+    level=os.getenv("LOG_LEVEL", "INFO").upper(),
+    format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+)
+logger = logging.getLogger(__name__)
+
+IMPORT_SECONDS = time.perf_counter() - _import_started
+
+# Cold-start budgets; exceeding one logs a warning. `python -m bench.startup` checks them too.
+STARTUP_IMPORT_BUDGET_SECONDS = float(os.getenv("STARTUP_IMPORT_BUDGET_SECONDS", "1.2"))
+STARTUP_WARMUP_BUDGET_SECONDS = float(os.getenv("STARTUP_WARMUP_BUDGET_SECONDS", "10"))
+# The warm-up pre-opens the OpenAI and Supabase connections after the server starts listening.
+# With WARMUP_PRELOAD it also builds the name index; snapshot mode always loads the snapshot.
+WARMUP_PRELOAD = os.getenv("WARMUP_PRELOAD", "true").lower() in ("1", "true", "yes")
+WARMUP_RETRY_SECONDS = float(os.getenv("WARMUP_RETRY_SECONDS", "5"))
+# Hold back all traffic until the warm-up finishes, for platforms without a readiness probe.
+WARMUP_BLOCKING = os.getenv("WARMUP_BLOCKING", "false").lower() in ("1", "true", "yes")
+
+if IMPORT_SECONDS > STARTUP_IMPORT_BUDGET_SECONDS:
+    logger.warning("Imports took %.2fs, over the %.2fs budget.", IMPORT_SECONDS, STARTUP_IMPORT_BUDGET_SECONDS)
+
+# Intents whose results are kept as conversation context for follow-up questions.
+LIST_INTENTS = ["filter", "ordered_list", "highest_total_compensation"]
+
+# Limits for /chat/batch: how many queries one batch may hold, and how many LLM
+# classifications and data fetches may run at once. Requests may only lower these.
+BATCH_MAX_QUERIES = int(os.getenv("BATCH_MAX_QUERIES", "1000"))
+BATCH_LLM_CONCURRENCY = int(os.getenv("BATCH_LLM_CONCURRENCY", "8"))
+BATCH_FETCH_CONCURRENCY = int(os.getenv("BATCH_FETCH_CONCURRENCY", "8"))
+
+
+# Shared counter bumped by /cache/invalidate; each worker reloads its data when it sees a new value.
+DATA_GENERATION_COUNTER = "data_generation"
+_data_generation = 0
+
+# Warm-up progress for the readiness probe: each step's status, and when the whole warm-up finished.
+warmup_state = {"checks": {}, "ready": False, "seconds": None}
+
+
+async def _warm_up_step(name: str, action, required: bool = True) -> bool:
+    started = time.perf_counter()
+    try:
+        await action()
+    except Exception as e:
+        logger.error("Warm-up step '%s' failed: %s", name, e)
+        warmup_state["checks"][name] = {"status": "failed", "required": required, "error": str(e)}
+        return not required
+    warmup_state["checks"][name] = {"status": "ok", "required": required, "seconds": round(time.perf_counter() - started, 3)}
+    return True
+
+
+async def warm_up(refresh_tasks: list) -> None:
+    """
+    Opens the upstream connections and preloads data, retrying failed required steps until
+    they succeed. Requests are served meanwhile: clients connect on demand, queries fall back
+    to Supabase until the snapshot is loaded, and name lookups to ilike until the index is built.
+    """
+    global _data_generation
+    started = time.perf_counter()
+    if shared_state is not None:
+        # Data loaded from here on is current as of this generation.
+        _data_generation = await asyncio.to_thread(shared_state.counter, DATA_GENERATION_COUNTER)
+    steps = {
+        "openai": (warm_up_openai, True),
+        "supabase": (lambda: warm_up_supabase(snapshot_engine.TABLE_NAME), True),
+    }
+    if snapshot_engine.SNAPSHOT_MODE:
+        # Serve every intent from an in-process copy of the table instead of Supabase.
+        steps["snapshot"] = (lambda: snapshot_engine.refresh_snapshot(full=True), True)
+    if WARMUP_PRELOAD:
+        # Name lookups fall back to ilike queries until the index is built.
+        steps["name_index"] = (refresh_name_index, False)
+
+    pending = dict(steps)
+    while True:
+        connections = {name: pending.pop(name) for name in ("openai", "supabase") if name in pending}
+        results = await asyncio.gather(*(_warm_up_step(name, *step) for name, step in connections.items()))
+        failed = {name: step for (name, step), ok in zip(connections.items(), results) if not ok}
+        # Data loads run after the connections, in order, since the name index reads the snapshot.
+        for name in [n for n in ("snapshot", "name_index") if n in pending]:
+            step = pending.pop(name)
+            if await _warm_up_step(name, *step):
+                if name == "snapshot":
+                    refresh_tasks.append(asyncio.create_task(snapshot_engine.snapshot_refresh_loop()))
+            else:
+                failed[name] = step
+        if not failed:
+            break
+        pending = failed
+        await asyncio.sleep(WARMUP_RETRY_SECONDS)
 
-# --- GLOBAL CACHE FOR SINGLE-USER DEMO ---
-# This dictionary will hold the context of the last "list-based" query.
-# It is NOT safe for a multi-user environment.
-LAST_CONTEXT_CACHE = {}
+    refresh_tasks.append(asyncio.create_task(name_index_refresh_loop()))
+    if shared_state is not None:
+        refresh_tasks.append(asyncio.create_task(data_generation_watch_loop()))
+    warmup_state["seconds"] = round(time.perf_counter() - started, 3)
+    warmup_state["ready"] = True
+    if warmup_state["seconds"] > STARTUP_WARMUP_BUDGET_SECONDS:
+        logger.warning("Warm-up took %.2fs, over the %.2fs budget.", warmup_state["seconds"], STARTUP_WARMUP_BUDGET_SECONDS)
 
-app = FastAPI(title="Stateless Demo API with Context Cache")
+
+async def reload_data() -> None:
+    """Reloads this worker's snapshot (in snapshot mode) and name index."""
+    if snapshot_engine.SNAPSHOT_MODE:
+        await snapshot_engine.refresh_snapshot(full=True)
+    try:
+        await refresh_name_index()
+    except Exception as e:
+        logger.error("Name index refresh failed: %s", e)
+
+
+async def data_generation_watch_loop() -> None:
+    """Background task that reloads this worker's data after another worker handles /cache/invalidate."""
+    global _data_generation
+    while True:
+        await asyncio.sleep(SHARED_STATE_POLL_SECONDS)
+        try:
+            generation = await asyncio.to_thread(shared_state.counter, DATA_GENERATION_COUNTER)
+            if generation != _data_generation:
+                _data_generation = generation
+                await reload_data()
+        except Exception as e:
+            logger.error("Reload after a shared invalidation failed: %s", e)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Nothing slow happens before the server starts listening; connections and data are warmed up behind it.
+    refresh_tasks = []
+    warmup_task = asyncio.create_task(warm_up(refresh_tasks))
+    if WARMUP_BLOCKING:
+        await warmup_task
+    yield
+    warmup_task.cancel()
+    for task in refresh_tasks:
+        task.cancel()
+    await close_async_supabase()
+    await close_openai()
+
+
+app = FastAPI(title="Employee Q&A API with Session Context", lifespan=lifespan)
 
 
 @app.get("/")
 def read_root():
-    """A simple health check endpoint for deployment platforms like Render."""
+    """Liveness check for deployment platforms like Render; answers as soon as the process is up. See /ready."""
     return {"status": "ok", "message": "Welcome to the Employee Q&A API!"}
 
 
-class ChatRequest(BaseModel):
-    query: str
+@app.get("/ready")
+def read_ready():
+    """Readiness probe: 200 once the warm-up has opened the upstream connections and preloaded data, 503 until then."""
+    body = {
+        "status": "ready" if warmup_state["ready"] else "warming_up",
+        "checks": warmup_state["checks"],
+        "import_seconds": round(IMPORT_SECONDS, 3),
+        "warmup_seconds": warmup_state["seconds"],
+        "budgets": {"import_seconds": STARTUP_IMPORT_BUDGET_SECONDS, "warmup_seconds": STARTUP_WARMUP_BUDGET_SECONDS},
+    }
+    return JSONResponse(body, status_code=200 if warmup_state["ready"] else 503)
 
-def detect_language(text: str) -> str:
-    """Detects if the primary language of the text is Arabic or English."""
-    arabic_chars = sum(1 for char in text if '\u0600' <= char <= '\u06FF')
-    return 'ar' if arabic_chars > 2 else 'en'
 
-def format_to_string_message(intent: str, raw_results: list, parsed_json: dict | None, lang: str = 'en') -> str:
+@app.get("/stats")
+def read_stats():
+    """Reports cache counters so we can see how much LLM traffic is being saved."""
+    return {
+        # Each worker keeps its own counters; the pid says which one answered.
+        "worker_pid": os.getpid(),
+        "intent_cache": intent_cache.stats(),
+        "result_cache": result_cache.stats(),
+        "query_plans": plan_cache_stats(),
+        "fast_path": fast_path_router.stats(),
+        "context_store": context_store.stats(),
+        "name_index": name_index.stats(),
+        "llm_tiers": tier_stats.stats(),
+    }
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def read_metrics():
+    """Prometheus scrape endpoint: stage latencies, Supabase call latencies, LLM tokens, per-intent counts and errors."""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+
+@app.post("/cache/flush")
+async def flush_caches():
+    """Drops every cached intent, e.g. after the prompt or the data model changes."""
+    await asyncio.to_thread(intent_cache.clear)
+    await result_cache.invalidate()
+    fast_path_router.reset()
+    return {"status": "ok", "intent_cache": intent_cache.stats(), "result_cache": result_cache.stats()}
+
+
+@app.post("/cache/invalidate")
+async def invalidate_data():
     """
-    Builds a single, formatted string message as the final output and manages the global cache.
+    Invalidation hook for when the employee data changes (e.g. a database webhook):
+    drops cached results and reloads the snapshot and name index. Cached intents are kept.
+    This worker reloads right away; other workers within SHARED_STATE_POLL_SECONDS.
     """
-    global LAST_CONTEXT_CACHE
+    global _data_generation
+    await result_cache.invalidate()
+    if shared_state is not None:
+        _data_generation = await asyncio.to_thread(shared_state.increment, DATA_GENERATION_COUNTER)
+    await reload_data()
+    return {"status": "ok", "result_cache": result_cache.stats()}
+
+
+class ChatRequest(BaseModel):
+    query: str
+    # Identifies the conversation for follow-up questions; a new one is issued when omitted.
+    session_id: str | None = None
+    # Continuation cursor from a previous response, to fetch the next page of a large result.
+    # The cursor carries the query plan, so the query text is not classified again.
+    cursor: str | None = None
 
-    # --- Cache Management: Decide whether to save or clear context ---
-    if intent in ["filter", "ordered_list", "highest_total_compensation"]:
+def format_to_string_message(intent: str, raw_results: list, parsed_json: dict | None, lang: str = 'en',
+                              has_more: bool = False, continued: bool = False) -> str:
+    """
+    Builds a single, formatted string message as the final output.
+    has_more and continued say whether the rows are one page of a longer list and not its first page.
+    """
+    if intent in LIST_INTENTS:
         if not raw_results:
-            LAST_CONTEXT_CACHE = {} # Clear cache if no results are found
             return "No matching records found."
-        
-        # This is a list-based query, so we SAVE its results to the cache for follow-ups.
-        LAST_CONTEXT_CACHE = {"raw_results": raw_results}
-        print(f"[DEBUG] Caching {len(raw_results)} records for next turn.")
-        
+
         # --- Specific Formatting for Filter Intent ---
-        if intent == "filter" and len(raw_results) == 1 and parsed_json:
+        if intent == "filter" and len(raw_results) == 1 and parsed_json and not continued:
             record = raw_results[0]
             requested_columns = parsed_json.get("columns")
 
@@ -118,16 +328,24 @@ def format_to_string_message(intent: str, raw_results: list, parsed_json: dict |
         names = [r.get(names_key) or r.get('full_name') for r in raw_results]
 
         if lang == 'ar':
-            message = f"لقد وجدت {len(raw_results)} موظفًا مطابقًا:\n" + "\n".join([f"- {name}" for name in names])
+            if continued:
+                header = f"إليك {len(raw_results)} موظفًا مطابقًا آخرين:"
+            elif has_more:
+                header = f"إليك أول {len(raw_results)} موظفًا مطابقًا:"
+            else:
+                header = f"لقد وجدت {len(raw_results)} موظفًا مطابقًا:"
+            message = f"{header}\n" + "\n".join([f"- {name}" for name in names])
             message += "\n\nيمكنك السؤال عن تفاصيل شخص معين أو طلب 'عرض كل التفاصيل'."
         else:
-            message = f"I found {len(raw_results)} matching employees:\n" + "\n".join([f"- {name}" for name in names])
+            if continued:
+                header = f"Showing the next {len(raw_results)} matching employees:"
+            elif has_more:
+                header = f"Showing the first {len(raw_results)} matching employees:"
+            else:
+                header = f"I found {len(raw_results)} matching employees:"
+            message = f"{header}\n" + "\n".join([f"- {name}" for name in names])
             message += "\n\nYou can ask for details about a specific person or say 'show all details'."
         return message
-    else:
-        # For any other intent, clear the cache.
-        LAST_CONTEXT_CACHE = {}
-        print("[DEBUG] Clearing context cache for non-list-based intent.")
 
     # --- Formatting logic for other intents ---
     if intent == "total_count":
@@ -189,77 +407,175 @@ def format_to_string_message(intent: str, raw_results: list, parsed_json: dict |
     return "I could not process the request."
 
 
+def more_results_note(lang: str) -> str:
+    if lang == 'ar':
+        return "\n\nهناك المزيد من النتائج؛ أرسل المؤشر 'next_cursor' مع طلبك التالي لعرض الصفحة التالية."
+    return "\n\nThere are more results; send the returned 'next_cursor' with your next request to see the next page."
+
+
 @app.post("/chat")
-def chat_handler(payload: ChatRequest):
-    lang = detect_language(payload.query)
-    print(f"\n[DEBUG] Received query: '{payload.query}'")
-    
-    # Pass the current query AND the globally cached context to the parser
-    parsed_json = parse_query_to_filter(payload.query, LAST_CONTEXT_CACHE)
-    
-    print(f"[DEBUG] LLM classified intent: {parsed_json}")
-    intent = parsed_json.get("intent")
-    raw_results = []
-    
+async def chat_handler(payload: ChatRequest):
+    started = time.perf_counter()
+    # Latency covers every outcome, including rejected plans and failed fetches.
+    intent = "unknown"
     try:
-        # --- TOOL ROUTER ---
-        if intent == "filter":
-            conditions = parsed_json.get("conditions", [])
-            columns_to_select = parsed_json.get("columns", ["*"])
-            select_string = ",".join(columns_to_select)
-
-            if conditions:
-                supa_query = supabase.table("qag_employees").select(select_string)
-                for f in conditions:
-                    operator, column, value = f.get("operator", "eq"), f.get("column"), f.get("value")
-                    query_value = f"%{value}%" if operator == "ilike" else value
-                    supa_query = getattr(supa_query, operator)(column, query_value)
-                raw_results = supa_query.execute().data
-        
-        elif intent == "total_count":
-            response = supabase.table("qag_employees").select('*', count='exact').execute()
-            if response.count is not None:
-                raw_results = [{"count": response.count}]
-
-        elif intent == "ordered_list":
-            p = parsed_json
-            response = supabase.rpc('get_ordered_employees', {'order_by_column': p["order_by_column"], 'is_ascending': p["ascending"], 'limit_count': p["limit"]}).execute()
-            raw_results = response.data
+        with stage_timer("detect_language"):
+            lang = detect_language(payload.query)
+        session_id = payload.session_id or uuid.uuid4().hex
+        logger.debug("Received query: %r (session %s)", payload.query, session_id)
 
-        elif intent == "highest_total_compensation":
-            p = parsed_json
-            limit = p.get("limit", 1)
-            response = supabase.rpc('get_top_employees_by_total_compensation', {'limit_count': limit}).execute()
-            raw_results = response.data
+        if payload.cursor:
+            # A next-page request reuses the plan carried by the cursor instead of classifying again.
+            try:
+                parsed_json = cursor_plan(payload.cursor)
+            except ValueError as e:
+                REQUEST_ERRORS.inc(endpoint="chat", intent=intent)
+                return {"message": f"I couldn't run that query: {e}", "session_id": session_id}
+        else:
+            # Pass the current query AND this session's context to the parser
+            with stage_timer("parse"):
+                parsed_json = await parse_query_to_filter(payload.query, await context_store.get(session_id), lang)
 
-        elif intent == "aggregate_count":
-            dimension = parsed_json["dimension"]
-            response = supabase.rpc('get_counts_by_dimension', {'dimension_column': dimension}).execute()
-            raw_results = response.data
+        logger.debug("Classified intent: %s", parsed_json)
+        intent = parsed_json.get("intent")
 
-        elif intent == "aggregate_metric":
-            p = parsed_json
-            response = supabase.rpc('get_aggregate_by_dimension', {'metric_column': p["metric_column"], 'dimension_column': p["dimension"], 'metric_type': p["metric"]}).execute()
-            raw_results = response.data
-        
-        elif intent == "conditional_aggregate_count":
-            p = parsed_json
-            conditions = p.get("conditions", [])
-            response = supabase.rpc('get_conditional_counts_by_dimension', {'dimension_column': p["dimension"], 'filters': conditions}).execute()
-            raw_results = response.data
-        
-        elif intent == "find_top_group":
-            p = parsed_json
-            is_desc = (p.get("ranking") == "highest")
-            response = supabase.rpc('get_top_category_by_metric', {'dimension_column': p["dimension"], 'metric_column': p["metric_column"], 'metric_type': p["metric"], 'is_descending': is_desc}).execute()
-            raw_results = response.data
-        
-        # Intent 'unsupported' requires no data fetching, it's handled by the formatter.
+        # Bad columns, operators or values are rejected here instead of failing a database round trip.
+        try:
+            with stage_timer("compile"):
+                parsed_json = compile_intent(parsed_json)
+        except PlanError as e:
+            REQUEST_ERRORS.inc(endpoint="chat", intent=intent)
+            logger.warning("Rejected plan for intent '%s': %s", intent, e)
+            return {"message": f"I couldn't run that query: {e}", "session_id": session_id}
 
-    except Exception as e:
-        print(f"[ERROR] Error executing intent '{intent}': {e}")
-        return {"message": f"An error occurred while processing your request: {e}"}
+        try:
+            raw_results, next_cursor = await run_intent(parsed_json, payload.cursor)
+        except Exception as e:
+            REQUEST_ERRORS.inc(endpoint="chat", intent=intent)
+            logger.error("Error executing intent '%s': %s", intent, e)
+            return {"message": f"An error occurred while processing your request: {e}", "session_id": session_id}
 
-    final_message = format_to_string_message(intent, raw_results, parsed_json, lang)
-    
-    return {"message": final_message}
+        # List-based answers become this session's context for follow-ups; anything else clears it.
+        if intent in LIST_INTENTS and raw_results:
+            await context_store.set(session_id, raw_results)
+            logger.debug("Saved %d references for session %s.", len(raw_results), session_id)
+        else:
+            await context_store.clear(session_id)
+
+        with stage_timer("format"):
+            final_message = format_to_string_message(
+                intent, raw_results, parsed_json, lang, has_more=next_cursor is not None, continued=payload.cursor is not None
+            )
+        if next_cursor:
+            final_message += more_results_note(lang)
+
+        REQUESTS.inc(endpoint="chat", intent=intent)
+        return {"message": final_message, "session_id": session_id, "next_cursor": next_cursor}
+    finally:
+        REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint="chat", intent=intent)
+
+
+def _read_batch_items(body: bytes, content_type: str) -> list[dict]:
+    """
+    Accepts either a JSON body {"queries": [...]} or an NDJSON upload with one query per line.
+    NDJSON lines may be plain strings or objects with a "query" (or "body") field and an optional id.
+    """
+    text = body.decode("utf-8")
+    if "ndjson" in content_type or "jsonl" in content_type:
+        records = [json.loads(line) for line in text.splitlines() if line.strip()]
+    else:
+        records = json.loads(text).get("queries", [])
+
+    items = []
+    for record in records:
+        if isinstance(record, str):
+            items.append({"id": None, "query": record})
+        elif isinstance(record, dict) and (record.get("query") or record.get("body")):
+            items.append({"id": record.get("id", record.get("request_id")), "query": record.get("query") or record.get("body")})
+        else:
+            raise ValueError(f"Each batch entry needs a query: {record!r}")
+    return items
+
+
+@app.post("/chat/batch")
+async def chat_batch_handler(request: Request, stream: bool = False,
+                             llm_concurrency: int | None = None, fetch_concurrency: int | None = None):
+    """
+    Answers many independent queries in one call. Identical normalized queries are classified once,
+    queries that resolve to the same intent share one backend call, and the work fans out under
+    bounded concurrency. Results come back in input order, or as NDJSON as they complete with ?stream=true.
+    Batch queries are stateless: no session context is read or written. Answers longer than one page
+    carry a next_cursor that /chat continues from.
+    """
+    try:
+        items = _read_batch_items(await request.body(), request.headers.get("content-type", ""))
+    except (ValueError, AttributeError) as e:
+        raise HTTPException(status_code=400, detail=f"Could not read the batch: {e}")
+    if len(items) > BATCH_MAX_QUERIES:
+        raise HTTPException(status_code=413, detail=f"A batch may contain at most {BATCH_MAX_QUERIES} queries.")
+
+    llm_slots = asyncio.Semaphore(max(1, min(llm_concurrency or BATCH_LLM_CONCURRENCY, BATCH_LLM_CONCURRENCY)))
+    fetch_slots = asyncio.Semaphore(max(1, min(fetch_concurrency or BATCH_FETCH_CONCURRENCY, BATCH_FETCH_CONCURRENCY)))
+    classifications: dict[str, asyncio.Task] = {}
+    fetches: dict[str, asyncio.Task] = {}
+
+    async def classify(query: str) -> dict:
+        async with llm_slots:
+            return await parse_query_to_filter(query, None, detect_language(query))
+
+    async def fetch(parsed_json: dict) -> tuple[list, str | None]:
+        async with fetch_slots:
+            return await run_intent(parsed_json)
+
+    async def answer(index: int, item: dict) -> dict:
+        started = time.perf_counter()
+        intent = "unknown"
+        try:
+            query = item["query"]
+            # Duplicates share one classification task, and equal intents share one fetch task.
+            key = normalize_text(query)
+            if key not in classifications:
+                classifications[key] = asyncio.create_task(classify(query))
+            parsed_json = await classifications[key]
+            intent = parsed_json.get("intent")
+            result = {"index": index, "id": item["id"], "query": query, "intent": intent}
+            try:
+                parsed_json = compile_intent(parsed_json)
+            except PlanError as e:
+                REQUEST_ERRORS.inc(endpoint="batch", intent=intent)
+                return {**result, "message": f"I couldn't run that query: {e}"}
+            try:
+                intent_key = json.dumps(parsed_json, sort_keys=True, ensure_ascii=False)
+                if intent_key not in fetches:
+                    fetches[intent_key] = asyncio.create_task(fetch(parsed_json))
+                raw_results, next_cursor = await fetches[intent_key]
+            except Exception as e:
+                REQUEST_ERRORS.inc(endpoint="batch", intent=intent)
+                logger.error("Error executing intent '%s' in batch: %s", intent, e)
+                return {**result, "message": f"An error occurred while processing your request: {e}"}
+            lang = detect_language(query)
+            with stage_timer("format"):
+                message = format_to_string_message(intent, raw_results, parsed_json, lang, has_more=next_cursor is not None)
+            if next_cursor:
+                message += more_results_note(lang)
+            REQUESTS.inc(endpoint="batch", intent=intent)
+            # Later pages are fetched through /chat with this cursor.
+            return {**result, "message": message, "next_cursor": next_cursor}
+        finally:
+            # Per query, from its start until its answer, including time spent waiting for a slot.
+            REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint="batch", intent=intent)
+
+    tasks = [asyncio.create_task(answer(i, item)) for i, item in enumerate(items)]
+
+    if stream:
+        async def stream_results():
+            for finished in asyncio.as_completed(tasks):
+                yield json.dumps(await finished, ensure_ascii=False) + "\n"
+        return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+
+    results = await asyncio.gather(*tasks)
+    return {
+        "results": results,
+        "unique_queries": len(classifications),
+        "backend_calls": len(fetches),
+    }
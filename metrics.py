@@ -0,0 +1,110 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+# Latency buckets in seconds, from sub-millisecond local work up to slow LLM calls.
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _label_key(labels: dict) -> tuple:
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(key: tuple, extra: tuple = ()) -> str:
+    pairs = [*key, *extra]
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str):
+        self.name = name
+        self.documentation = documentation
+        self._values: dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(key)} {value:g}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, buckets: tuple = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = buckets
+        # Per label set: [bucket counts..., +Inf count], sum
+        self._values: dict[tuple, tuple[list[int], float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            counts, total = self._values.get(key) or ([0] * (len(self.buckets) + 1), 0.0)
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._values[key] = (counts, total + value)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total) in sorted(self._values.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, counts):
+                    cumulative += count
+                    lines.append(f"{self.name}_bucket{_format_labels(key, (('le', f'{bound:g}'),))} {cumulative}")
+                cumulative += counts[-1]
+                lines.append(f"{self.name}_bucket{_format_labels(key, (('le', '+Inf'),))} {cumulative}")
+                lines.append(f"{self.name}_sum{_format_labels(key)} {total:.6f}")
+                lines.append(f"{self.name}_count{_format_labels(key)} {cumulative}")
+        return lines
+
+
+STAGE_SECONDS = Histogram("app_stage_duration_seconds", "Time spent in each stage of answering a query.")
+# Every query is timed whatever its outcome, so the latency histogram's _count is the total;
+# the error rate is app_request_errors_total / app_request_duration_seconds_count.
+REQUEST_SECONDS = Histogram(
+    "app_request_duration_seconds", "End-to-end latency of every query, whatever its outcome, by endpoint and intent."
+)
+REQUESTS = Counter("app_requests_total", "Queries answered with results, by endpoint and intent.")
+REQUEST_ERRORS = Counter(
+    "app_request_errors_total",
+    "Queries answered with an error (invalid cursor, rejected plan or failed fetch), by endpoint and intent.",
+)
+SUPABASE_SECONDS = Histogram("app_supabase_call_duration_seconds", "Latency of each Supabase table query or RPC.")
+SUPABASE_ERRORS = Counter("app_supabase_call_errors_total", "Failed or timed-out Supabase calls.")
+LLM_TOKENS = Counter("app_llm_tokens_total", "LLM tokens used, by model and token type.")
+LLM_ERRORS = Counter("app_llm_errors_total", "LLM calls that failed or returned unusable output.")
+
+REGISTRY = [
+    REQUESTS, REQUEST_ERRORS, REQUEST_SECONDS, STAGE_SECONDS,
+    SUPABASE_SECONDS, SUPABASE_ERRORS, LLM_TOKENS, LLM_ERRORS,
+]
+
+
+@contextmanager
+def stage_timer(stage: str, **labels):
+    """Records how long the wrapped block takes; works around awaits as well."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - started, stage=stage, **labels)
+
+
+def render_metrics() -> str:
+    """All metrics in the Prometheus text exposition format."""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
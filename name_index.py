@@ -0,0 +1,143 @@
+import asyncio
+import logging
+import os
+from collections import defaultdict
+
+from text_utils import normalize_text
+from supabase_client import fetch_all_rows
+from snapshot_engine import TABLE_NAME, current_snapshot
+
+logger = logging.getLogger(__name__)
+
+NAME_FIELDS = ("full_name", "full_name_en", "position")
+
+NAME_INDEX_REFRESH_SECONDS = float(os.getenv("NAME_INDEX_REFRESH_SECONDS", "300"))
+NAME_INDEX_MAX_RESULTS = int(os.getenv("NAME_INDEX_MAX_RESULTS", "50"))
+# Share of the query's trigrams a name must contain to count as a typo-tolerant match.
+NAME_INDEX_FUZZY_THRESHOLD = float(os.getenv("NAME_INDEX_FUZZY_THRESHOLD", "0.5"))
+NAME_INDEX_FUZZY_LIMIT = int(os.getenv("NAME_INDEX_FUZZY_LIMIT", "10"))
+# Above this many matches a name filter is left to the database, so the id list stays a sane URL length.
+NAME_INDEX_MAX_REWRITE_IDS = int(os.getenv("NAME_INDEX_MAX_REWRITE_IDS", "1000"))
+
+
+def _trigrams(text: str) -> set[str]:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class NameIndex:
+    """
+    An in-memory trigram index over full_name, full_name_en and position.
+    Text is indexed with Arabic normalization, so lookups ignore diacritics and alef/yaa/taa-marbuta
+    variants. A single pass over the posting lists answers both substring (the `ilike '%x%'`
+    semantics) and fuzzy lookups, returning ranked military_ids.
+    """
+
+    def __init__(self):
+        self._docs: list[tuple] = []
+        self._postings: dict[str, list[int]] = {}
+        self.ready = False
+
+    def build(self, rows: list[dict]) -> None:
+        docs, postings = [], defaultdict(list)
+        for row in rows:
+            military_id = row.get("military_id")
+            if military_id is None:
+                continue
+            for field in NAME_FIELDS:
+                value = row.get(field)
+                if not value:
+                    continue
+                text = normalize_text(str(value))
+                trigrams = _trigrams(f" {text} ")
+                doc_id = len(docs)
+                docs.append((military_id, field, text, len(trigrams)))
+                for trigram in trigrams:
+                    postings[trigram].append(doc_id)
+        # Swap the new structures in together so concurrent lookups never see a half-built index.
+        self._docs, self._postings, self.ready = docs, dict(postings), True
+
+    def search(self, query: str, fields: tuple[str, ...] | list[str] | None = None,
+               limit: int | None = NAME_INDEX_MAX_RESULTS, fuzzy: bool = True) -> list:
+        """
+        Returns military_ids whose names contain the query, best matches first; limit=None returns all of them.
+        When nothing contains it, falls back to at most NAME_INDEX_FUZZY_LIMIT names that share most of its
+        trigrams, unless fuzzy is False.
+        """
+        docs, postings = self._docs, self._postings
+        text = normalize_text(query)
+        if not text:
+            return []
+        fields = set(fields or NAME_FIELDS)
+
+        inner = _trigrams(text)
+        padded = _trigrams(f" {text} ")
+        if inner:
+            shared, shared_inner = defaultdict(int), defaultdict(int)
+            for trigram in padded:
+                is_inner = trigram in inner
+                for doc_id in postings.get(trigram, ()):
+                    shared[doc_id] += 1
+                    if is_inner:
+                        shared_inner[doc_id] += 1
+            substring_candidates = [d for d, count in shared_inner.items() if count == len(inner)]
+        else:
+            # Queries shorter than a trigram can't use the postings; the table is small enough to scan.
+            shared = {}
+            substring_candidates = range(len(docs))
+
+        ranked: dict = {}
+        for doc_id in substring_candidates:
+            military_id, field, doc_text, _ = docs[doc_id]
+            if field not in fields or text not in doc_text:
+                continue
+            if doc_text == text:
+                position = 0
+            elif doc_text.startswith(text):
+                position = 1
+            elif f" {text}" in f" {doc_text}":
+                position = 2
+            else:
+                position = 3
+            score = (position, len(doc_text))
+            if military_id not in ranked or score < ranked[military_id]:
+                ranked[military_id] = score
+
+        if not ranked and fuzzy:
+            for doc_id, count in shared.items():
+                military_id, field, doc_text, doc_trigrams = docs[doc_id]
+                if field not in fields or count / len(padded) < NAME_INDEX_FUZZY_THRESHOLD:
+                    continue
+                similarity = count / (len(padded) + doc_trigrams - count)
+                score = (4, -similarity)
+                if military_id not in ranked or score < ranked[military_id]:
+                    ranked[military_id] = score
+            limit = NAME_INDEX_FUZZY_LIMIT if limit is None else min(limit, NAME_INDEX_FUZZY_LIMIT)
+
+        return sorted(ranked, key=ranked.get)[:limit]
+
+    def stats(self) -> dict:
+        return {"ready": self.ready, "entries": len(self._docs), "trigrams": len(self._postings)}
+
+
+name_index = NameIndex()
+
+
+async def refresh_name_index() -> None:
+    """Rebuilds the index from the snapshot when one is loaded, otherwise from a name-only projection."""
+    snapshot = current_snapshot()
+    if snapshot is not None:
+        rows = snapshot.rows
+    else:
+        rows = await fetch_all_rows(TABLE_NAME, columns="military_id," + ",".join(NAME_FIELDS))
+    await asyncio.to_thread(name_index.build, rows)
+
+
+async def name_index_refresh_loop() -> None:
+    """Background task that keeps the index in step with the table while the app runs."""
+    while True:
+        await asyncio.sleep(NAME_INDEX_REFRESH_SECONDS)
+        try:
+            await refresh_name_index()
+        except Exception as e:
+            # Keep serving the last good index if a refresh fails.
+            logger.error("Name index refresh failed: %s", e)
@@ -1,6 +1,36 @@
-from supabase_client import supabase
+import base64
+import hashlib
+import hmac
+import json
+import os
+from datetime import date
+from supabase_client import get_supabase, get_async_supabase, execute
+from snapshot_engine import current_snapshot
+from name_index import name_index, NAME_FIELDS, NAME_INDEX_MAX_REWRITE_IDS
+from metrics import stage_timer
+from result_cache import result_cache, RESULT_CACHE_ENABLED
+from query_plan import COLUMN_TYPES
+
+# Maximum rows returned per filter/ordered-list response; larger results continue via a cursor.
+QUERY_PAGE_SIZE = int(os.getenv("QUERY_PAGE_SIZE", "50"))
+# Columns the formatter needs for a large top/bottom-N list.
+LIST_COLUMNS = ["military_id", "full_name", "full_name_en"]
+# postgrest-py names these filter methods in_ and is_ because `in` and `is` are Python keywords.
+POSTGREST_METHODS = {"in": "in_", "is": "is_"}
+# Signs continuation cursors so clients can't edit the plan or position they carry. Every worker
+# and replica must use the same secret; by default it is derived from SUPABASE_KEY, which they share.
+CURSOR_SECRET = os.getenv("CURSOR_SECRET", "")
 
 def fetch_matching_employees(query: str):
+    supabase = get_supabase()
+    # Resolve names and positions through the local index in one pass, then fetch just those rows.
+    if name_index.ready:
+        military_ids = name_index.search(query, limit=None)
+        # An empty answer may just mean the index is behind the table, so let the database look too.
+        if 0 < len(military_ids) <= NAME_INDEX_MAX_REWRITE_IDS:
+            response = supabase.table("qag_employees").select("*").in_("military_id", military_ids).execute()
+            return _order_by_ids(response.data, military_ids)
+
     # Simplistic keyword-based matching across multiple columns
     response = supabase.table("qag_employees").select("*").ilike("full_name", f"%{query}%").execute()
     results = response.data
@@ -11,6 +41,40 @@ def fetch_matching_employees(query: str):
 
     return results
 
+
+def _order_by_ids(rows: list, military_ids: list) -> list:
+    """Puts rows back into the index's ranking order."""
+    rank = {military_id: i for i, military_id in enumerate(military_ids)}
+    return sorted(rows, key=lambda r: rank.get(r.get("military_id"), len(rank)))
+
+
+def resolve_name_conditions(conditions: list) -> tuple[list, list | None]:
+    """
+    Replaces `ilike` conditions on name columns with a military_id lookup answered by the name index.
+    Returns the rewritten conditions and the ranked ids, or None for the ids when nothing was rewritten.
+    When the index finds nothing (it may be behind the table) or too many ids to send, the original
+    ilike conditions are kept and the database answers instead.
+    """
+    if not name_index.ready:
+        return conditions, None
+    rewritten, ranked_ids = [], None
+    for f in conditions:
+        if f.get("operator") == "ilike" and f.get("column") in NAME_FIELDS and f.get("value"):
+            # Every match is needed here: the ids become the complete result set, paged by the cursor.
+            military_ids = name_index.search(str(f["value"]), fields=[f["column"]], limit=None)
+            if ranked_ids is None:
+                ranked_ids = military_ids
+            else:
+                allowed = set(military_ids)
+                ranked_ids = [military_id for military_id in ranked_ids if military_id in allowed]
+            continue
+        rewritten.append(f)
+    if ranked_ids is not None and not (0 < len(ranked_ids) <= NAME_INDEX_MAX_REWRITE_IDS):
+        return conditions, None
+    if ranked_ids is not None:
+        rewritten.append({"column": "military_id", "operator": "in", "value": ranked_ids})
+    return rewritten, ranked_ids
+
 def format_response(records):
     if not records:
         return {"message": "لم يتم العثور على نتائج. No results found."}
@@ -27,3 +91,262 @@ def format_response(records):
             "🧮 مدة الإجازة": f"{r['last_leave_duration_days']} يومًا"
         })
     return formatted
+
+
+async def run_intent(parsed_json: dict, cursor: str | None = None) -> tuple[list, str | None]:
+    """
+    The tool router: fetches the raw rows for a classified intent.
+    Uses the in-process snapshot when snapshot mode is on, otherwise Supabase.
+    Large filter and ordered results come back one page at a time; the second value is the
+    continuation cursor for the next page, or None on the last page.
+    """
+    intent = parsed_json.get("intent")
+    position = decode_cursor(cursor, parsed_json) if cursor else None
+    # Cursors carry the plan as given here, before any name rewrite.
+    plan = parsed_json
+
+    ranked_ids = None
+    if intent == "filter" and parsed_json.get("conditions"):
+        with stage_timer("name_lookup"):
+            conditions, ranked_ids = resolve_name_conditions(parsed_json["conditions"])
+        parsed_json = {**parsed_json, "conditions": conditions}
+
+    snapshot = current_snapshot()
+    if snapshot is not None:
+        with stage_timer("snapshot_query", intent=intent):
+            raw_results = snapshot.run_intent(parsed_json)
+        if intent not in ("filter", "ordered_list"):
+            return raw_results, None
+        if ranked_ids:
+            # Name matches page in the index's ranking order, so page 1 holds the best ones.
+            raw_results = _order_by_ids(raw_results, ranked_ids)
+        # The snapshot is local, so an offset cursor is as cheap as a keyset one here.
+        offset = _cursor_field(position, "n") if position is not None else 0
+        page = raw_results[offset:offset + QUERY_PAGE_SIZE]
+        next_cursor = None
+        if offset + QUERY_PAGE_SIZE < len(raw_results):
+            next_cursor = encode_cursor(plan, {"n": offset + QUERY_PAGE_SIZE})
+        return page, next_cursor
+
+    if not RESULT_CACHE_ENABLED:
+        return await _fetch_from_supabase(parsed_json, position, plan, ranked_ids)
+    # Identical intents within the TTL, or in flight at the same time, share one backend call.
+    key = result_cache.make_key(parsed_json, cursor)
+    return await result_cache.get_or_compute(
+        key, lambda: _fetch_from_supabase(parsed_json, position, plan, ranked_ids)
+    )
+
+
+async def _fetch_from_supabase(parsed_json: dict, position: dict | None, plan: dict,
+                               ranked_ids: list | None) -> tuple[list, str | None]:
+    """Runs one intent against Supabase table queries and RPCs."""
+    intent = parsed_json.get("intent")
+    raw_results, next_cursor = [], None
+    supabase = await get_async_supabase()
+
+    # --- TOOL ROUTER ---
+    if intent == "filter":
+        conditions = parsed_json.get("conditions", [])
+        requested_columns = [c for c in parsed_json.get("columns") or [] if c != "*"]
+        # Full rows when no columns were asked for, so a single match is shown in full without a
+        # second round trip; a page is at most QUERY_PAGE_SIZE + 1 rows. military_id is the page key.
+        select_columns = requested_columns or ["*"]
+        if "military_id" not in select_columns and select_columns != ["*"]:
+            select_columns = [*select_columns, "military_id"]
+
+        if conditions and ranked_ids:
+            raw_results, next_cursor = await _fetch_ranked_page(
+                supabase, conditions, select_columns, ranked_ids, position, plan
+            )
+        elif conditions:
+            supa_query = _apply_conditions(supabase.table("qag_employees").select(",".join(select_columns)), conditions)
+            if position is not None:
+                supa_query = supa_query.gt("military_id", _cursor_field(position, "id"))
+            # One extra row tells us whether there is another page without a separate count.
+            supa_query = supa_query.order("military_id").limit(QUERY_PAGE_SIZE + 1)
+            raw_results = (await execute(supa_query)).data
+            if len(raw_results) > QUERY_PAGE_SIZE:
+                raw_results = raw_results[:QUERY_PAGE_SIZE]
+                next_cursor = encode_cursor(plan, {"id": raw_results[-1]["military_id"]})
+
+    elif intent == "total_count":
+        # A HEAD request returns just the count header, no rows.
+        response = await execute(supabase.table("qag_employees").select("military_id", count="exact", head=True))
+        if response.count is not None:
+            raw_results = [{"count": response.count}]
+
+    elif intent == "ordered_list":
+        p = parsed_json
+        if p["limit"] <= QUERY_PAGE_SIZE:
+            response = await execute(supabase.rpc('get_ordered_employees', {'order_by_column': p["order_by_column"], 'is_ascending': p["ascending"], 'limit_count': p["limit"]}))
+            raw_results = response.data
+        else:
+            raw_results, next_cursor = await _fetch_ordered_page(supabase, p, position, plan)
+
+    elif intent == "highest_total_compensation":
+        p = parsed_json
+        limit = p.get("limit", 1)
+        response = await execute(supabase.rpc('get_top_employees_by_total_compensation', {'limit_count': limit}))
+        raw_results = response.data
+
+    elif intent == "aggregate_count":
+        dimension = parsed_json["dimension"]
+        response = await execute(supabase.rpc('get_counts_by_dimension', {'dimension_column': dimension}))
+        raw_results = response.data
+
+    elif intent == "aggregate_metric":
+        p = parsed_json
+        response = await execute(supabase.rpc('get_aggregate_by_dimension', {'metric_column': p["metric_column"], 'dimension_column': p["dimension"], 'metric_type': p["metric"]}))
+        raw_results = response.data
+
+    elif intent == "conditional_aggregate_count":
+        p = parsed_json
+        conditions = p.get("conditions", [])
+        response = await execute(supabase.rpc('get_conditional_counts_by_dimension', {'dimension_column': p["dimension"], 'filters': conditions}))
+        raw_results = response.data
+
+    elif intent == "find_top_group":
+        p = parsed_json
+        is_desc = (p.get("ranking") == "highest")
+        response = await execute(supabase.rpc('get_top_category_by_metric', {'dimension_column': p["dimension"], 'metric_column': p["metric_column"], 'metric_type': p["metric"], 'is_descending': is_desc}))
+        raw_results = response.data
+
+    # Intent 'unsupported' requires no data fetching, it's handled by the formatter.
+    return raw_results, next_cursor
+
+
+def _apply_conditions(supa_query, conditions: list):
+    for f in conditions:
+        operator, column, value = f.get("operator", "eq"), f.get("column"), f.get("value")
+        query_value = f"%{value}%" if operator == "ilike" else value
+        supa_query = getattr(supa_query, POSTGREST_METHODS.get(operator, operator))(column, query_value)
+    return supa_query
+
+
+async def _fetch_ranked_page(supabase, conditions: list, select_columns: list, ranked_ids: list,
+                             position: dict | None, plan: dict) -> tuple[list, str | None]:
+    """
+    Pages through name-index matches in ranking order: each page fetches the next slice of
+    ranked_ids, so page 1 holds the best matches rather than the lowest military_ids. Other
+    conditions may drop some ids, in which case further slices fill the page.
+    """
+    # Each slice replaces the id condition that resolve_name_conditions added for the whole ranking.
+    conditions = [f for f in conditions if not (f.get("column") == "military_id" and f.get("value") == ranked_ids)]
+    offset = _cursor_field(position, "n") if position is not None else 0
+    rows = []
+    while len(rows) < QUERY_PAGE_SIZE and offset < len(ranked_ids):
+        page_ids = ranked_ids[offset:offset + QUERY_PAGE_SIZE - len(rows)]
+        offset += len(page_ids)
+        supa_query = supabase.table("qag_employees").select(",".join(select_columns)).in_("military_id", page_ids)
+        rows += _order_by_ids((await execute(_apply_conditions(supa_query, conditions))).data, page_ids)
+    next_cursor = encode_cursor(plan, {"n": offset}) if offset < len(ranked_ids) else None
+    return rows, next_cursor
+
+
+async def _fetch_ordered_page(supabase, p: dict, position: dict | None, plan: dict) -> tuple[list, str | None]:
+    """
+    Pages through a large top/bottom-N list with a (value, military_id) keyset,
+    so each request transfers at most one page no matter how large N is.
+    """
+    column, ascending = p["order_by_column"], p["ascending"]
+    returned = _cursor_field(position, "n") if position is not None else 0
+    page_size = min(QUERY_PAGE_SIZE, p["limit"] - returned)
+    if page_size <= 0:
+        return [], None
+
+    select_columns = list(dict.fromkeys([*LIST_COLUMNS, column]))
+    supa_query = supabase.table("qag_employees").select(",".join(select_columns)).not_.is_(column, "null")
+    if position is not None:
+        value, operator = _postgrest_value(_cursor_field(position, "value")), "gt" if ascending else "lt"
+        last_id = _postgrest_value(_cursor_field(position, "id"))
+        supa_query = supa_query.or_(f"{column}.{operator}.{value},and({column}.eq.{value},military_id.gt.{last_id})")
+    supa_query = supa_query.order(column, desc=not ascending).order("military_id").limit(page_size)
+    rows = (await execute(supa_query)).data
+
+    returned += len(rows)
+    next_cursor = None
+    if rows and len(rows) == page_size and returned < p["limit"]:
+        last = rows[-1]
+        next_cursor = encode_cursor(plan, {"value": last[column], "id": last["military_id"], "n": returned})
+    return rows, next_cursor
+
+
+def _postgrest_value(value) -> str:
+    """Quotes text values so commas and parentheses don't break a PostgREST or=() filter."""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return str(value)
+    return '"' + str(value).replace('"', '\\"') + '"'
+
+
+def _cursor_key() -> bytes:
+    secret = CURSOR_SECRET or "cursor:" + os.getenv("SUPABASE_KEY", "")
+    return hashlib.sha256(secret.encode("utf-8")).digest()
+
+
+def _sign(payload: str) -> str:
+    digest = hmac.new(_cursor_key(), payload.encode("utf-8"), hashlib.sha256).digest()[:16]
+    return base64.urlsafe_b64encode(digest).decode("ascii").rstrip("=")
+
+
+def encode_cursor(plan: dict, position: dict) -> str:
+    """
+    An opaque, signed continuation cursor. It carries the plan it was issued for, so the next page
+    is fetched without classifying the query again.
+    """
+    payload = json.dumps({"p": plan, **position}, separators=(",", ":"), ensure_ascii=False)
+    payload = base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+    return f"{payload}.{_sign(payload)}"
+
+
+def _read_cursor(cursor: str) -> dict:
+    payload, _, signature = cursor.partition(".")
+    if not signature or not hmac.compare_digest(signature.encode("utf-8"), _sign(payload).encode("utf-8")):
+        raise ValueError("The cursor is not valid.")
+    try:
+        position = json.loads(base64.urlsafe_b64decode((payload + "=" * (-len(payload) % 4)).encode("ascii")))
+    except Exception:
+        raise ValueError("The cursor is not valid.")
+    if not isinstance(position, dict) or not isinstance(position.get("p"), dict):
+        raise ValueError("The cursor is not valid.")
+    return position
+
+
+def _valid_cursor_value(plan: dict, value) -> bool:
+    """A keyset value must have the type of the column the list is ordered by."""
+    kind = COLUMN_TYPES.get(plan.get("order_by_column"))
+    if kind in ("integer", "numeric"):
+        return isinstance(value, (int, float)) and not isinstance(value, bool)
+    if kind == "date":
+        try:
+            return isinstance(value, str) and date.fromisoformat(value).isoformat() == value
+        except ValueError:
+            return False
+    return kind == "text" and isinstance(value, str)
+
+
+def _cursor_field(position: dict, key: str):
+    if key not in position:
+        raise ValueError("The cursor is not valid.")
+    return position[key]
+
+
+def cursor_plan(cursor: str) -> dict:
+    """The plan a cursor was issued for. Compile it again before running it."""
+    return _read_cursor(cursor)["p"]
+
+
+def decode_cursor(cursor: str, parsed_json: dict) -> dict:
+    """The page position a cursor holds, checked against the query it must belong to."""
+    position = _read_cursor(cursor)
+    if position.pop("p") != parsed_json:
+        raise ValueError("The cursor does not belong to this query; send the same query it was returned for.")
+    for key, value in position.items():
+        if key in ("id", "n"):
+            valid = isinstance(value, int) and not isinstance(value, bool) and value >= 0
+        elif key == "value":
+            valid = _valid_cursor_value(parsed_json, value)
+        else:
+            valid = False
+        if not valid:
+            raise ValueError("The cursor is not valid.")
+    return position
@@ -0,0 +1,249 @@
+import copy
+import json
+import os
+from datetime import date, datetime
+from functools import lru_cache
+
+# qag_employees columns the service may query, with their types.
+COLUMN_TYPES = {
+    "military_id": "integer",
+    "full_name": "text",
+    "rank": "text",
+    "marital_status": "text",
+    "base_salary": "numeric",
+    "civil_clothing_allowance": "numeric",
+    "military_clothing_allowance": "numeric",
+    "housing_allowance": "numeric",
+    "phone_allowance": "numeric",
+    "unit_allowance": "numeric",
+    "social_allowance": "numeric",
+    "transport_allowance": "numeric",
+    "position_allowance": "numeric",
+    "specialty_allowance": "numeric",
+    "risk_allowance": "numeric",
+    "total_loan": "numeric",
+    "remaining_loan": "numeric",
+    "retirement_deduction": "numeric",
+    "position": "text",
+    "enlistment_date": "date",
+    "birth_date": "date",
+    "annual_leave_balance": "integer",
+    "grant_leave_balance": "integer",
+    "emergency_leave_balance": "integer",
+    "last_leave_date": "date",
+    "last_leave_duration_days": "integer",
+    "full_name_en": "text",
+}
+
+_ORDERED_OPERATORS = {"eq", "neq", "gt", "gte", "lt", "lte", "in", "is"}
+OPERATORS_BY_TYPE = {
+    "integer": _ORDERED_OPERATORS,
+    "numeric": _ORDERED_OPERATORS,
+    "date": _ORDERED_OPERATORS,
+    "text": {"eq", "neq", "like", "ilike", "in", "is"},
+}
+# postgrest-py method names (in_/is_ avoid Python keywords) are accepted as spellings of the plain operators.
+OPERATOR_ALIASES = {"in_": "in", "is_": "is"}
+
+# Required keys for each intent.
+INTENT_REQUIRED_KEYS = {
+    "filter": ["conditions"],
+    "aggregate_count": ["dimension"],
+    "aggregate_metric": ["dimension", "metric", "metric_column"],
+    "ordered_list": ["order_by_column", "ascending", "limit"],
+    "highest_total_compensation": [],
+    "conditional_aggregate_count": ["dimension", "conditions"],
+    "find_top_group": ["dimension", "metric_column", "metric", "ranking"],
+    "total_count": [],
+    "unsupported": [],
+}
+
+METRICS = {"count", "sum", "avg", "min", "max"}
+METRIC_ALIASES = {"average": "avg", "mean": "avg", "total": "sum", "minimum": "min", "maximum": "max"}
+RANKING_ALIASES = {"top": "highest", "largest": "highest", "bottom": "lowest", "smallest": "lowest"}
+
+PLAN_MAX_LIMIT = int(os.getenv("PLAN_MAX_LIMIT", "10000"))
+PLAN_CACHE_SIZE = int(os.getenv("PLAN_CACHE_SIZE", "4096"))
+
+
+class PlanError(ValueError):
+    """An intent that can't be run against qag_employees; the message says why."""
+
+
+def _column(name, role: str, types: tuple[str, ...] | None = None) -> str:
+    if name not in COLUMN_TYPES:
+        raise PlanError(f"Unknown {role} column {name!r}.")
+    if types and COLUMN_TYPES[name] not in types:
+        raise PlanError(f"The {role} column {name!r} must be {' or '.join(types)}, not {COLUMN_TYPES[name]}.")
+    return name
+
+
+def _coerce(column: str, value):
+    """Converts a condition value to the column's type, or raises PlanError."""
+    kind = COLUMN_TYPES[column]
+    if kind in ("integer", "numeric"):
+        if isinstance(value, bool):
+            raise PlanError(f"{column} expects a number, got {value!r}.")
+        try:
+            number = float(value.replace(",", "").strip()) if isinstance(value, str) else float(value)
+        except (TypeError, ValueError):
+            raise PlanError(f"{column} expects a number, got {value!r}.")
+        if number.is_integer():
+            return int(number)
+        if kind == "integer":
+            raise PlanError(f"{column} expects a whole number, got {value!r}.")
+        return number
+    if kind == "date":
+        text = str(value).strip()
+        try:
+            return date.fromisoformat(text).isoformat()
+        except ValueError:
+            try:
+                return datetime.fromisoformat(text).date().isoformat()
+            except ValueError:
+                raise PlanError(f"{column} expects a date like 2024-01-31, got {value!r}.")
+    if isinstance(value, (dict, list)):
+        raise PlanError(f"{column} expects text, got {value!r}.")
+    return str(value).strip()
+
+
+def _compile_condition(condition) -> dict:
+    if not isinstance(condition, dict):
+        raise PlanError(f"Each condition must be an object, got {condition!r}.")
+    column = _column(condition.get("column"), "condition")
+    operator = str(condition.get("operator", "eq")).lower()
+    operator = OPERATOR_ALIASES.get(operator, operator)
+    if operator not in OPERATORS_BY_TYPE[COLUMN_TYPES[column]]:
+        allowed = ", ".join(sorted(OPERATORS_BY_TYPE[COLUMN_TYPES[column]]))
+        raise PlanError(f"Operator {operator!r} can't be used on {COLUMN_TYPES[column]} column {column!r}; use one of {allowed}.")
+    value = condition.get("value")
+
+    if operator == "is":
+        if value is None or str(value).lower() == "null":
+            value = None
+        elif str(value).lower() in ("true", "false"):
+            value = str(value).lower() == "true"
+        else:
+            raise PlanError(f"Operator 'is' only compares with null, true or false, got {value!r}.")
+    elif operator == "in":
+        values = value.split(",") if isinstance(value, str) else value
+        if not isinstance(values, list) or not values:
+            raise PlanError(f"Operator {operator!r} on {column!r} needs a non-empty list of values.")
+        value = [_coerce(column, v) for v in values]
+    elif value is None:
+        raise PlanError(f"The condition on {column!r} has no value; use operator 'is' to match nulls.")
+    elif operator in ("like", "ilike"):
+        # The query engine adds the surrounding wildcards itself.
+        value = str(value).strip().strip("%*")
+        if not value:
+            raise PlanError(f"The {operator} condition on {column!r} has an empty pattern.")
+    else:
+        value = _coerce(column, value)
+    return {"column": column, "operator": operator, "value": value}
+
+
+def _positive_int(value, key: str) -> int:
+    try:
+        number = float(value) if not isinstance(value, bool) else None
+    except (TypeError, ValueError):
+        number = None
+    if number is None or not number.is_integer() or number <= 0:
+        raise PlanError(f"{key} must be a positive whole number, got {value!r}.")
+    if number > PLAN_MAX_LIMIT:
+        raise PlanError(f"{key} may be at most {PLAN_MAX_LIMIT}, got {value!r}.")
+    return int(number)
+
+
+def _boolean(value, key: str) -> bool:
+    if isinstance(value, bool):
+        return value
+    if str(value).lower() in ("true", "1", "yes", "asc", "ascending"):
+        return True
+    if str(value).lower() in ("false", "0", "no", "desc", "descending"):
+        return False
+    raise PlanError(f"{key} must be true or false, got {value!r}.")
+
+
+def _metric(value) -> str:
+    metric = METRIC_ALIASES.get(str(value).lower(), str(value).lower())
+    if metric not in METRICS:
+        raise PlanError(f"Unknown metric {value!r}; use one of {', '.join(sorted(METRICS))}.")
+    return metric
+
+
+@lru_cache(maxsize=PLAN_CACHE_SIZE)
+def _compile(intent_json: str) -> dict:
+    parsed = json.loads(intent_json)
+    if not isinstance(parsed, dict):
+        raise PlanError("The intent is not a JSON object.")
+    intent = parsed.get("intent")
+    if intent not in INTENT_REQUIRED_KEYS:
+        raise PlanError(f"Unknown intent {intent!r}.")
+    missing = [key for key in INTENT_REQUIRED_KEYS[intent] if key not in parsed]
+    if missing:
+        raise PlanError(f"The {intent} intent is missing {', '.join(missing)}.")
+
+    plan = {"intent": intent}
+    if intent == "unsupported":
+        plan["reason"] = str(parsed.get("reason") or "I am unable to answer that question.")
+        return plan
+
+    if "conditions" in parsed:
+        conditions = parsed["conditions"]
+        if not isinstance(conditions, list) or (intent == "filter" and not conditions):
+            raise PlanError("conditions must be a non-empty list.")
+        plan["conditions"] = [_compile_condition(c) for c in conditions]
+    if intent == "filter" and parsed.get("columns"):
+        columns = parsed["columns"]
+        if not isinstance(columns, list):
+            raise PlanError("columns must be a list of column names.")
+        plan["columns"] = list(dict.fromkeys(c if c == "*" else _column(c, "requested") for c in columns))
+    if "dimension" in parsed:
+        plan["dimension"] = _column(parsed["dimension"], "dimension")
+    if "metric" in parsed:
+        plan["metric"] = _metric(parsed["metric"])
+    if "metric_column" in parsed:
+        metric_column = parsed["metric_column"]
+        if plan.get("metric") == "count" and metric_column not in COLUMN_TYPES:
+            # Counting doesn't read the metric column, so any placeholder will do.
+            metric_column = "military_id"
+        plan["metric_column"] = _column(metric_column, "metric", ("integer", "numeric"))
+    if intent == "find_top_group":
+        ranking = str(parsed["ranking"]).lower()
+        plan["ranking"] = RANKING_ALIASES.get(ranking, ranking)
+        if plan["ranking"] not in ("highest", "lowest"):
+            raise PlanError(f"ranking must be 'highest' or 'lowest', got {parsed['ranking']!r}.")
+    if intent == "ordered_list":
+        plan["order_by_column"] = _column(parsed["order_by_column"], "order by")
+        plan["ascending"] = _boolean(parsed["ascending"], "ascending")
+    if intent in ("ordered_list", "highest_total_compensation"):
+        plan["limit"] = _positive_int(parsed.get("limit", 1), "limit")
+    return plan
+
+
+def compile_intent(parsed_json: dict) -> dict:
+    """
+    Validates an intent against the qag_employees schema and returns a normalized plan:
+    known columns only, operators allowed for each column's type, values coerced to the
+    column types and defaults filled in. Compiling a plan again returns it unchanged.
+    Raises PlanError, before any network call, when the intent can't be run.
+    Compiled plans are cached by their JSON.
+    """
+    try:
+        intent_json = json.dumps(parsed_json, sort_keys=True, ensure_ascii=False)
+    except (TypeError, ValueError) as e:
+        raise PlanError(f"The intent is not valid JSON: {e}")
+    # The cached plan is shared, so hand out a copy.
+    return copy.deepcopy(_compile(intent_json))
+
+
+def plan_cache_stats() -> dict:
+    info = _compile.cache_info()
+    lookups = info.hits + info.misses
+    return {
+        "size": info.currsize,
+        "max_entries": info.maxsize,
+        "hits": info.hits,
+        "misses": info.misses,
+        "hit_rate": round(info.hits / lookups, 4) if lookups else 0.0,
+    }
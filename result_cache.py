@@ -0,0 +1,187 @@
+import asyncio
+import copy
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from shared_state import SharedState, shared_state
+
+# Shared counter bumped on invalidation, so every worker drops its cached results.
+SHARED_GENERATION_COUNTER = "result_cache_generation"
+
+
+def _canonical_value(value, operator: str | None = None):
+    """
+    Normalizes only what can't change the answer: the order of an in-list and the case of an
+    ilike pattern. Plans are already coerced by compile_intent, so values are otherwise kept as is.
+    """
+    if isinstance(value, str) and operator == "ilike":
+        return value.casefold()
+    if isinstance(value, list):
+        return sorted((_canonical_value(v, operator) for v in value), key=repr)
+    return value
+
+
+def canonicalize_intent(parsed_json: dict) -> dict:
+    """The intent JSON with sorted conditions and columns and case-normalized ilike patterns."""
+    canonical = {}
+    for key, value in parsed_json.items():
+        if key == "conditions":
+            conditions = [
+                {
+                    "column": c.get("column"),
+                    "operator": c.get("operator", "eq"),
+                    "value": _canonical_value(c.get("value"), c.get("operator", "eq")),
+                }
+                for c in value or []
+            ]
+            canonical[key] = sorted(conditions, key=lambda c: json.dumps(c, sort_keys=True, ensure_ascii=False))
+        elif key == "columns":
+            canonical[key] = sorted(set(value or []))
+        elif key in ("metric", "ranking"):
+            canonical[key] = str(value).lower()
+        elif key == "reason":
+            # Free text that doesn't affect the data fetched.
+            continue
+        else:
+            canonical[key] = _canonical_value(value)
+    return canonical
+
+
+class ResultCache:
+    """
+    A TTL, memory-bounded LRU cache for backend results keyed on the canonical intent JSON,
+    with single-flight coalescing: concurrent identical queries share one backend call.
+    Results stay in process memory; with a shared state store, invalidations reach every worker.
+    """
+
+    def __init__(self, ttl_seconds: float = 60, max_bytes: int = 32 * 1024 * 1024, max_entries: int = 2048,
+                 shared: SharedState | None = None):
+        self.shared = shared
+        self._shared_generation: int | None = None
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[float, int, object]] = OrderedDict()
+        self._inflight: dict[str, asyncio.Task] = {}
+        self._bytes = 0
+        self._generation = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(parsed_json: dict, cursor: str | None = None) -> str:
+        return json.dumps([canonicalize_intent(parsed_json), cursor], sort_keys=True, ensure_ascii=False)
+
+    def _lookup(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            stored_at, size, value = entry
+            if time.monotonic() - stored_at > self.ttl_seconds:
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def _store(self, key: str, value, generation: int) -> None:
+        size = len(json.dumps(value, ensure_ascii=False, default=str).encode("utf-8"))
+        with self._lock:
+            # Results fetched before an invalidation may be stale, so don't keep them.
+            if generation != self._generation or size > self.max_bytes:
+                return
+            self._remove(key)
+            self._entries[key] = (time.monotonic(), size, value)
+            self._bytes += size
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[1]
+
+    async def _sync_generation(self) -> None:
+        """Drops local results if another worker has invalidated since we last looked."""
+        if self.shared is None:
+            return
+        generation = await asyncio.to_thread(self.shared.counter, SHARED_GENERATION_COUNTER)
+        if generation != self._shared_generation:
+            with self._lock:
+                self._entries.clear()
+                self._bytes = 0
+                self._generation += 1
+                self._shared_generation = generation
+
+    async def get_or_compute(self, key: str, compute):
+        """Returns the cached value for key, joining an in-flight computation or starting one."""
+        await self._sync_generation()
+        value = self._lookup(key)
+        if value is not None:
+            return copy.deepcopy(value)
+
+        task = self._inflight.get(key)
+        if task is not None:
+            with self._lock:
+                self.coalesced += 1
+        else:
+            with self._lock:
+                self.misses += 1
+                generation = self._generation
+
+            async def run():
+                try:
+                    result = await compute()
+                    self._store(key, result, generation)
+                    return result
+                finally:
+                    self._inflight.pop(key, None)
+
+            # Run the backend call as its own task so one caller disconnecting doesn't cancel it for the rest.
+            task = asyncio.ensure_future(run())
+            self._inflight[key] = task
+        return copy.deepcopy(await asyncio.shield(task))
+
+    async def invalidate(self) -> None:
+        """Drops every cached result; call when the employee data changes."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self._generation += 1
+        if self.shared is not None:
+            generation = await asyncio.to_thread(self.shared.increment, SHARED_GENERATION_COUNTER)
+            with self._lock:
+                self._shared_generation = generation
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses + self.coalesced
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "evictions": self.evictions,
+                "hit_rate": round((self.hits + self.coalesced) / lookups, 4) if lookups else 0.0,
+            }
+
+
+RESULT_CACHE_ENABLED = os.getenv("RESULT_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+
+result_cache = ResultCache(
+    ttl_seconds=float(os.getenv("RESULT_CACHE_TTL_SECONDS", "60")),
+    max_bytes=int(os.getenv("RESULT_CACHE_MAX_BYTES", str(32 * 1024 * 1024))),
+    max_entries=int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "2048")),
+    shared=shared_state,
+)
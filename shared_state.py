@@ -0,0 +1,152 @@
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+# Worker processes per container. uvicorn reads WEB_CONCURRENCY itself; the app only needs it
+# to know whether state must be shared between workers.
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
+# The SQLite file that holds the state shared by every worker on this host.
+# Defaults to a file in the temp directory when more than one worker runs; empty means per-process memory.
+SHARED_STATE_PATH = os.getenv("SHARED_STATE_PATH") or (
+    os.path.join(tempfile.gettempdir(), "employee-api-state.sqlite3") if WEB_CONCURRENCY > 1 else ""
+)
+# How often each worker checks whether another worker has invalidated the employee data.
+SHARED_STATE_POLL_SECONDS = float(os.getenv("SHARED_STATE_POLL_SECONDS", "1"))
+# Caps are enforced at most this often, so bursts of writes don't each pay for a count.
+SHARED_STATE_EVICT_INTERVAL_SECONDS = float(os.getenv("SHARED_STATE_EVICT_INTERVAL_SECONDS", "1"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    stored_at REAL NOT NULL,
+    PRIMARY KEY (namespace, key)
+);
+CREATE INDEX IF NOT EXISTS entries_by_age ON entries (namespace, stored_at);
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+
+class SharedState:
+    """
+    A small JSON key/value store with TTLs in a SQLite file in WAL mode, so every worker
+    process on the host sees the same conversation context and caches. WAL lets readers run
+    alongside the single writer; each call is a short local transaction, well under a millisecond.
+    Entries are namespaced and evicted least recently written (or touched) first once a namespace is over its caps.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._connection: sqlite3.Connection | None = None
+        self._pid: int | None = None
+        self._lock = threading.Lock()
+        self._last_evict: dict[str, float] = {}
+
+    def _connect(self) -> sqlite3.Connection:
+        # Opened lazily, and again in a forked child, since SQLite connections can't cross processes.
+        if self._connection is None or self._pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.executescript(_SCHEMA)
+            self._connection, self._pid = connection, os.getpid()
+        return self._connection
+
+    def get(self, namespace: str, key: str, ttl_seconds: float, touch: bool = False):
+        """
+        The stored value, or None when it is missing or older than ttl_seconds.
+        With touch, a hit also resets the entry's age, so TTL and eviction follow the last use (LRU).
+        """
+        now = time.time()
+        with self._lock:
+            connection = self._connect()
+            row = connection.execute(
+                "SELECT value, stored_at FROM entries WHERE namespace = ? AND key = ?", (namespace, key)
+            ).fetchone()
+            if row is None or now - row[1] > ttl_seconds:
+                return None
+            if touch:
+                connection.execute(
+                    "UPDATE entries SET stored_at = ? WHERE namespace = ? AND key = ?", (now, namespace, key)
+                )
+        return json.loads(row[0])
+
+    def set(self, namespace: str, key: str, value, size: int | None = None) -> None:
+        encoded = json.dumps(value, ensure_ascii=False, default=str)
+        with self._lock:
+            self._connect().execute(
+                "INSERT OR REPLACE INTO entries (namespace, key, value, size, stored_at) VALUES (?, ?, ?, ?, ?)",
+                (namespace, key, encoded, len(encoded.encode("utf-8")) if size is None else size, time.time()),
+            )
+
+    def delete(self, namespace: str, key: str) -> None:
+        with self._lock:
+            self._connect().execute("DELETE FROM entries WHERE namespace = ? AND key = ?", (namespace, key))
+
+    def clear(self, namespace: str) -> None:
+        with self._lock:
+            self._connect().execute("DELETE FROM entries WHERE namespace = ?", (namespace,))
+
+    def evict(self, namespace: str, ttl_seconds: float, max_entries: int | None = None,
+              max_bytes: int | None = None) -> int:
+        """Drops expired entries, then the oldest ones until the namespace fits its caps. Returns how many went."""
+        now = time.time()
+        if now - self._last_evict.get(namespace, 0) < SHARED_STATE_EVICT_INTERVAL_SECONDS:
+            return 0
+        self._last_evict[namespace] = now
+        with self._lock:
+            connection = self._connect()
+            removed = connection.execute(
+                "DELETE FROM entries WHERE namespace = ? AND stored_at < ?", (namespace, now - ttl_seconds)
+            ).rowcount
+            count, total = connection.execute(
+                "SELECT COUNT(*), TOTAL(size) FROM entries WHERE namespace = ?", (namespace,)
+            ).fetchone()
+            if (max_entries is None or count <= max_entries) and (max_bytes is None or total <= max_bytes):
+                return removed
+            # Walk from the oldest entry until enough has been dropped to fit both caps.
+            excess_entries = max(0, count - max_entries) if max_entries is not None else 0
+            excess_bytes = max(0, total - max_bytes) if max_bytes is not None else 0
+            stale, freed = [], 0
+            for key, size in connection.execute(
+                "SELECT key, size FROM entries WHERE namespace = ? ORDER BY stored_at", (namespace,)
+            ):
+                if len(stale) >= excess_entries and freed >= excess_bytes:
+                    break
+                stale.append((namespace, key))
+                freed += size
+            connection.executemany("DELETE FROM entries WHERE namespace = ? AND key = ?", stale)
+            return removed + len(stale)
+
+    def stats(self, namespace: str) -> tuple[int, int]:
+        """Number of entries and their total size in bytes."""
+        with self._lock:
+            count, total = self._connect().execute(
+                "SELECT COUNT(*), TOTAL(size) FROM entries WHERE namespace = ?", (namespace,)
+            ).fetchone()
+        return count, int(total)
+
+    def counter(self, name: str) -> int:
+        with self._lock:
+            row = self._connect().execute("SELECT value FROM counters WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else 0
+
+    def increment(self, name: str) -> int:
+        with self._lock:
+            connection = self._connect()
+            connection.execute(
+                "INSERT INTO counters (name, value) VALUES (?, 1) ON CONFLICT(name) DO UPDATE SET value = value + 1",
+                (name,),
+            )
+            return connection.execute("SELECT value FROM counters WHERE name = ?", (name,)).fetchone()[0]
+
+
+shared_state = SharedState(SHARED_STATE_PATH) if SHARED_STATE_PATH else None
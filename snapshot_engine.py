@@ -0,0 +1,383 @@
+import asyncio
+import importlib
+import logging
+import os
+import re
+from typing import TYPE_CHECKING
+
+from supabase_client import fetch_all_rows
+from result_cache import result_cache
+
+logger = logging.getLogger(__name__)
+
+if TYPE_CHECKING:
+    import numpy as np
+else:
+    # NumPy is imported when the first snapshot is built, so starting with snapshot mode off skips it.
+    np = None
+
+
+def _import_numpy() -> None:
+    global np
+    if np is None:
+        np = importlib.import_module("numpy")
+
+TABLE_NAME = "qag_employees"
+
+# Columns summed by the get_top_employees_by_total_compensation RPC (NULLs count as 0).
+COMPENSATION_COLUMNS = [
+    "base_salary", "civil_clothing_allowance", "military_clothing_allowance", "housing_allowance",
+    "phone_allowance", "unit_allowance", "social_allowance", "transport_allowance",
+    "position_allowance", "specialty_allowance", "risk_allowance",
+]
+
+SNAPSHOT_MODE = os.getenv("SNAPSHOT_MODE", "false").lower() in ("1", "true", "yes")
+SNAPSHOT_REFRESH_SECONDS = float(os.getenv("SNAPSHOT_REFRESH_SECONDS", "300"))
+# Every Nth refresh reloads the whole table to pick up updates and deletes;
+# the others only pull rows created since the last load.
+SNAPSHOT_FULL_REFRESH_EVERY = int(os.getenv("SNAPSHOT_FULL_REFRESH_EVERY", "12"))
+SNAPSHOT_PAGE_SIZE = int(os.getenv("SNAPSHOT_PAGE_SIZE", "1000"))
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _like_to_regex(pattern: str) -> re.Pattern:
+    """Translates a SQL LIKE pattern ('%' and '_' wildcards) into an anchored regex."""
+    parts = []
+    for char in pattern:
+        if char == "%":
+            parts.append(".*")
+        elif char == "_":
+            parts.append(".")
+        else:
+            parts.append(re.escape(char))
+    return re.compile("".join(parts), re.DOTALL)
+
+
+class EmployeeSnapshot:
+    """
+    An immutable, NumPy-backed columnar copy of qag_employees.
+    Answers every intent locally with vectorized filters, group-bys and top-k,
+    returning rows shaped like the corresponding Supabase query or RPC.
+    """
+
+    def __init__(self, rows: list[dict]):
+        _import_numpy()
+        self.rows = rows
+        self.size = len(rows)
+        self.numeric: dict[str, np.ndarray] = {}
+        self.integer_columns: set[str] = set()
+        self.text: dict[str, np.ndarray] = {}
+        self.text_folded: dict[str, np.ndarray] = {}
+        self.nulls: dict[str, np.ndarray] = {}
+
+        column_names = []
+        for row in rows:
+            for key in row:
+                if key not in column_names:
+                    column_names.append(key)
+
+        for column in column_names:
+            values = [row.get(column) for row in rows]
+            self.nulls[column] = np.fromiter((v is None for v in values), dtype=bool, count=self.size)
+            present = [v for v in values if v is not None]
+            if present and all(_is_number(v) for v in present):
+                self.numeric[column] = np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+                if all(isinstance(v, int) for v in present):
+                    self.integer_columns.add(column)
+            else:
+                text = np.array(["" if v is None else str(v) for v in values], dtype=str)
+                self.text[column] = text
+                self.text_folded[column] = np.char.lower(text)
+
+        self.created_at_watermark = max(
+            (row["created_at"] for row in rows if row.get("created_at")), default=None
+        )
+
+    # --- Column access ---
+
+    def _check_column(self, column: str) -> None:
+        if column not in self.nulls:
+            raise ValueError(f"Unknown column '{column}'.")
+
+    def _numeric_column(self, column: str) -> "np.ndarray":
+        self._check_column(column)
+        if column not in self.numeric:
+            raise ValueError(f"Column '{column}' is not numeric.")
+        return self.numeric[column]
+
+    def _output_value(self, column: str, value):
+        if value is None or (isinstance(value, float) and np.isnan(value)):
+            return None
+        if column in self.integer_columns and float(value).is_integer():
+            return int(value)
+        return float(value)
+
+    # --- Filtering ---
+
+    def _condition_mask(self, condition: dict) -> "np.ndarray":
+        operator = condition.get("operator", "eq")
+        column = condition.get("column")
+        value = condition.get("value")
+        self._check_column(column)
+        nulls = self.nulls[column]
+
+        if operator in ("is", "is_"):
+            if value is None or str(value).lower() == "null":
+                return nulls
+            if str(value).lower() not in ("true", "false"):
+                raise ValueError(f"Operator 'is' only compares with null, true or false, got {value!r}.")
+            # IS TRUE / IS FALSE match that boolean only, never NULL, and need a boolean column.
+            if column in self.numeric:
+                raise ValueError(f"Operator 'is {str(value).lower()}' is not supported on numeric column '{column}'.")
+            return (self.text_folded[column] == str(value).lower()) & ~nulls
+        if operator in ("like", "ilike"):
+            if column in self.numeric:
+                raise ValueError(f"Operator '{operator}' is not supported on numeric column '{column}'.")
+            # The Supabase path wraps ilike values in '%...%', so do the same here.
+            pattern = f"%{value}%" if operator == "ilike" else str(value)
+            haystack = self.text_folded[column] if operator == "ilike" else self.text[column]
+            if operator == "ilike":
+                pattern = pattern.lower()
+            inner = pattern[1:-1]
+            if len(pattern) > 2 and pattern[0] == pattern[-1] == "%" and "%" not in inner and "_" not in inner:
+                # Plain substring search, the common case for name lookups.
+                mask = np.char.find(haystack, inner) >= 0
+            else:
+                regex = _like_to_regex(pattern)
+                mask = np.fromiter((regex.fullmatch(s) is not None for s in haystack), dtype=bool, count=self.size)
+            return mask & ~nulls
+        if operator in ("in", "in_"):
+            values = value if isinstance(value, (list, tuple)) else [value]
+            if column in self.numeric:
+                return np.isin(self.numeric[column], [float(v) for v in values])
+            return np.isin(self.text[column], [str(v) for v in values]) & ~nulls
+
+        if column in self.numeric:
+            data, value = self.numeric[column], float(value)
+        else:
+            data, value = self.text[column], str(value)
+        comparisons = {
+            "eq": np.equal, "neq": np.not_equal, "gt": np.greater,
+            "gte": np.greater_equal, "lt": np.less, "lte": np.less_equal,
+        }
+        if operator not in comparisons:
+            raise ValueError(f"Unsupported operator '{operator}'.")
+        return comparisons[operator](data, value) & ~nulls
+
+    def filter_mask(self, conditions: list[dict] | None) -> "np.ndarray":
+        mask = np.ones(self.size, dtype=bool)
+        for condition in conditions or []:
+            mask &= self._condition_mask(condition)
+        return mask
+
+    def _project(self, indices, columns: list[str] | None = None) -> list[dict]:
+        if not columns or "*" in columns:
+            return [dict(self.rows[i]) for i in indices]
+        for column in columns:
+            self._check_column(column)
+        return [{column: self.rows[i].get(column) for column in columns} for i in indices]
+
+    # --- Ordering ---
+
+    def _top_k(self, values: "np.ndarray", candidates: "np.ndarray", limit: int, ascending: bool) -> "np.ndarray":
+        """Indices of the top/bottom `limit` candidates by value, skipping NULLs, ties by table order."""
+        if limit <= 0:
+            return candidates[:0]
+        candidates = candidates[~np.isnan(values[candidates])]
+        keys = values[candidates] if ascending else -values[candidates]
+        if limit < len(candidates):
+            # Keep everything up to the k-th key, including all ties, so ties still resolve by table order.
+            kth = np.partition(keys, limit - 1)[limit - 1]
+            keep = keys <= kth
+            candidates, keys = candidates[keep], keys[keep]
+        order = np.lexsort((candidates, keys))
+        return candidates[order][:limit]
+
+    # --- Grouping ---
+
+    def _group(self, dimension: str, mask: "np.ndarray"):
+        self._check_column(dimension)
+        selected = np.flatnonzero(mask)
+        if dimension in self.numeric:
+            keys = self.numeric[dimension][selected]
+            # np.unique cannot group NaN reliably, so NULL keys go to a sentinel group
+            # that is reported as a NULL category, as SQL GROUP BY does.
+            keys = np.where(np.isnan(keys), np.inf, keys)
+        else:
+            # Prefix each key with a NULL flag so NULL and empty-string categories stay distinct.
+            flags = np.where(self.nulls[dimension][selected], "0", "1")
+            keys = np.char.add(flags, self.text[dimension][selected])
+        categories, inverse = np.unique(keys, return_inverse=True)
+        return selected, categories, inverse
+
+    def _category_value(self, dimension: str, category):
+        if dimension in self.numeric:
+            return None if np.isinf(category) else self._output_value(dimension, category)
+        return None if category[0] == "0" else str(category[1:])
+
+    def _aggregate(self, dimension: str, metric_column: str, metric: str, mask: "np.ndarray"):
+        metric = (metric or "").lower()
+        selected, categories, inverse = self._group(dimension, mask)
+        if metric == "count":
+            return categories, np.bincount(inverse, minlength=len(categories)).astype(np.float64)
+
+        values = self._numeric_column(metric_column)[selected]
+        present = ~np.isnan(values)
+        counts = np.bincount(inverse, weights=present, minlength=len(categories))
+        if metric == "sum":
+            result = np.bincount(inverse, weights=np.where(present, values, 0.0), minlength=len(categories))
+        elif metric == "avg":
+            sums = np.bincount(inverse, weights=np.where(present, values, 0.0), minlength=len(categories))
+            with np.errstate(invalid="ignore", divide="ignore"):
+                result = sums / counts
+        elif metric in ("min", "max"):
+            if len(categories) == 0:
+                return categories, np.array([], dtype=np.float64)
+            order = np.argsort(inverse, kind="stable")
+            starts = np.concatenate(([0], np.flatnonzero(np.diff(inverse[order])) + 1))
+            reducer = np.fmin if metric == "min" else np.fmax
+            result = reducer.reduceat(values[order], starts)
+        else:
+            raise ValueError(f"Unsupported metric '{metric}'.")
+        # Groups without any non-NULL metric value aggregate to NULL, as in SQL.
+        result = np.where(counts > 0, result, np.nan)
+        return categories, result
+
+    def _group_rows(self, dimension: str, categories, values, key: str, as_int: bool) -> list[dict]:
+        rows = []
+        for category, value in zip(categories, values):
+            if np.isnan(value):
+                output = None
+            elif as_int:
+                output = int(value)
+            else:
+                output = float(value)
+            rows.append({"category": self._category_value(dimension, category), key: output})
+        # Largest groups first, NULL aggregates last, then by category for a stable order.
+        rows.sort(key=lambda r: (r[key] is None, -(r[key] or 0), str(r["category"])))
+        return rows
+
+    # --- Intents ---
+
+    def count_by(self, dimension: str, conditions: list[dict] | None = None) -> list[dict]:
+        mask = self.filter_mask(conditions)
+        categories, counts = self._aggregate(dimension, None, "count", mask)
+        return self._group_rows(dimension, categories, counts, "count", as_int=True)
+
+    def aggregate_by(self, dimension: str, metric_column: str, metric: str) -> list[dict]:
+        mask = np.ones(self.size, dtype=bool)
+        categories, values = self._aggregate(dimension, metric_column, metric, mask)
+        as_int = metric.lower() == "count" or (metric.lower() != "avg" and metric_column in self.integer_columns)
+        return self._group_rows(dimension, categories, values, "value", as_int=as_int)
+
+    def top_group(self, dimension: str, metric_column: str, metric: str, descending: bool) -> list[dict]:
+        rows = [r for r in self.aggregate_by(dimension, metric_column, metric) if r["value"] is not None]
+        if not rows:
+            return []
+        best = max(rows, key=lambda r: r["value"]) if descending else min(rows, key=lambda r: r["value"])
+        return [best]
+
+    def ordered(self, column: str, ascending: bool, limit: int, conditions: list[dict] | None = None) -> list[dict]:
+        values = self._numeric_column(column) if column in self.numeric else None
+        candidates = np.flatnonzero(self.filter_mask(conditions))
+        if values is None:
+            # Text and date columns sort lexicographically (ISO dates sort correctly as text).
+            self._check_column(column)
+            candidates = candidates[~self.nulls[column][candidates]]
+            order = np.argsort(self.text[column][candidates], kind="stable")
+            if not ascending:
+                order = order[::-1]
+            return self._project(candidates[order][:limit])
+        return self._project(self._top_k(values, candidates, limit, ascending))
+
+    def top_total_compensation(self, limit: int) -> list[dict]:
+        total = np.zeros(self.size, dtype=np.float64)
+        for column in COMPENSATION_COLUMNS:
+            if column in self.numeric:
+                total += np.nan_to_num(self.numeric[column], nan=0.0)
+        indices = self._top_k(total, np.arange(self.size), limit, ascending=False)
+        as_int = all(column in self.integer_columns for column in COMPENSATION_COLUMNS if column in self.numeric)
+        return [
+            {
+                "military_id": self.rows[i].get("military_id"),
+                "full_name": self.rows[i].get("full_name"),
+                "full_name_en": self.rows[i].get("full_name_en"),
+                "total_compensation": int(total[i]) if as_int else float(total[i]),
+            }
+            for i in indices
+        ]
+
+    def run_intent(self, parsed_json: dict) -> list[dict]:
+        """Executes an intent the same way the Supabase tool router would."""
+        p = parsed_json
+        intent = p.get("intent")
+        if intent == "filter":
+            conditions = p.get("conditions", [])
+            if not conditions:
+                return []
+            return self._project(np.flatnonzero(self.filter_mask(conditions)), p.get("columns"))
+        if intent == "total_count":
+            return [{"count": self.size}]
+        if intent == "ordered_list":
+            return self.ordered(p["order_by_column"], p["ascending"], p["limit"])
+        if intent == "highest_total_compensation":
+            return self.top_total_compensation(p.get("limit", 1))
+        if intent == "aggregate_count":
+            return self.count_by(p["dimension"])
+        if intent == "aggregate_metric":
+            return self.aggregate_by(p["dimension"], p["metric_column"], p["metric"])
+        if intent == "conditional_aggregate_count":
+            return self.count_by(p["dimension"], p.get("conditions", []))
+        if intent == "find_top_group":
+            return self.top_group(p["dimension"], p["metric_column"], p["metric"], p.get("ranking") == "highest")
+        return []
+
+
+# --- Loading and refresh ---
+
+_snapshot: EmployeeSnapshot | None = None
+_refresh_count = 0
+
+
+def current_snapshot() -> EmployeeSnapshot | None:
+    """The live snapshot, or None when snapshot mode is off or it has not loaded yet."""
+    return _snapshot
+
+
+async def refresh_snapshot(full: bool = False) -> EmployeeSnapshot:
+    """
+    Reloads the snapshot. Incremental refreshes merge rows created since the last load
+    by military_id; full refreshes replace the table. The new snapshot is swapped in atomically.
+    """
+    global _snapshot, _refresh_count
+    previous = _snapshot
+    if full or previous is None or previous.created_at_watermark is None:
+        rows = await fetch_all_rows(TABLE_NAME, page_size=SNAPSHOT_PAGE_SIZE)
+    else:
+        new_rows = await fetch_all_rows(TABLE_NAME, created_after=previous.created_at_watermark, page_size=SNAPSHOT_PAGE_SIZE)
+        if not new_rows:
+            return previous
+        merged = {row.get("military_id"): row for row in previous.rows}
+        merged.update({row.get("military_id"): row for row in new_rows})
+        rows = list(merged.values())
+    # Building the arrays is CPU-bound, so keep it off the event loop.
+    _snapshot = await asyncio.to_thread(EmployeeSnapshot, rows)
+    _refresh_count += 1
+    # Results cached from before the reload may no longer match the table.
+    await result_cache.invalidate()
+    return _snapshot
+
+
+async def snapshot_refresh_loop() -> None:
+    """Background task that keeps the snapshot fresh while the app runs."""
+    while True:
+        await asyncio.sleep(SNAPSHOT_REFRESH_SECONDS)
+        try:
+            full = SNAPSHOT_FULL_REFRESH_EVERY > 0 and _refresh_count % SNAPSHOT_FULL_REFRESH_EVERY == 0
+            await refresh_snapshot(full=full)
+        except Exception as e:
+            # Keep serving the last good snapshot if a refresh fails.
+            logger.error("Snapshot refresh failed: %s", e)
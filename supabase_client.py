@@ -1,8 +1,115 @@
-from supabase import create_client
+import asyncio
+import importlib
+import time
 import os
+from typing import TYPE_CHECKING
 from dotenv import load_dotenv
+from metrics import SUPABASE_SECONDS, SUPABASE_ERRORS
+
+if TYPE_CHECKING:
+    from supabase import AsyncClient, Client
 
 load_dotenv()
 supabase_url = os.getenv("SUPABASE_URL")
 supabase_key = os.getenv("SUPABASE_KEY")
-supabase = create_client(supabase_url, supabase_key)
+
+# Per-call timeout for every table query and RPC on the async path.
+SUPABASE_TIMEOUT_SECONDS = float(os.getenv("SUPABASE_TIMEOUT_SECONDS", "10"))
+
+# Clients are built on first use rather than at import, so the app starts (and answers its
+# health check) without paying for the supabase import or failing on missing credentials.
+supabase: "Client | None" = None
+# Opened once (by the startup warm-up or the first request) so all requests share one keep-alive pool.
+async_supabase: "AsyncClient | None" = None
+_connect_lock: asyncio.Lock | None = None
+
+
+def _credentials() -> tuple[str, str]:
+    if not supabase_url or not supabase_key:
+        raise RuntimeError("SUPABASE_URL and SUPABASE_KEY must be set.")
+    return supabase_url, supabase_key
+
+
+def get_supabase() -> "Client":
+    """The synchronous client, created on first use."""
+    global supabase
+    if supabase is None:
+        from supabase import create_client
+
+        supabase = create_client(*_credentials())
+    return supabase
+
+
+async def connect_async_supabase() -> "AsyncClient":
+    global async_supabase, _connect_lock
+    if async_supabase is not None:
+        return async_supabase
+    if _connect_lock is None:
+        _connect_lock = asyncio.Lock()
+    async with _connect_lock:
+        if async_supabase is None:
+            url, key = _credentials()
+            # The supabase package is slow to import, so keep it off the event loop.
+            supabase_module = await asyncio.to_thread(importlib.import_module, "supabase")
+            from supabase.lib.client_options import AsyncClientOptions
+
+            async_supabase = await supabase_module.acreate_client(
+                url,
+                key,
+                options=AsyncClientOptions(postgrest_client_timeout=SUPABASE_TIMEOUT_SECONDS),
+            )
+    return async_supabase
+
+
+async def close_async_supabase() -> None:
+    global async_supabase
+    if async_supabase is not None:
+        await async_supabase.postgrest.aclose()
+        async_supabase = None
+
+
+async def get_async_supabase() -> "AsyncClient":
+    """The shared async client, connecting on demand if the warm-up hasn't yet."""
+    return async_supabase if async_supabase is not None else await connect_async_supabase()
+
+
+async def warm_up_supabase(table: str) -> None:
+    """Connects and opens a pooled connection with a cheap HEAD count, which also checks the credentials."""
+    client = await connect_async_supabase()
+    await execute(client.table(table).select("military_id", count="exact", head=True))
+
+
+def _call_name(request_builder) -> str:
+    """A metrics label such as 'rpc:get_counts_by_dimension' or 'table:qag_employees'."""
+    path = str(getattr(getattr(request_builder, "request", None), "path", ""))
+    kind = "rpc" if "/rpc/" in path else "table"
+    return f"{kind}:{path.rstrip('/').rsplit('/', 1)[-1] or 'unknown'}"
+
+
+async def execute(request_builder):
+    """Runs a PostgREST table query or RPC with the per-call timeout applied."""
+    call = _call_name(request_builder)
+    started = time.perf_counter()
+    try:
+        return await asyncio.wait_for(request_builder.execute(), timeout=SUPABASE_TIMEOUT_SECONDS)
+    except Exception:
+        SUPABASE_ERRORS.inc(call=call)
+        raise
+    finally:
+        SUPABASE_SECONDS.observe(time.perf_counter() - started, call=call)
+
+
+async def fetch_all_rows(table: str, columns: str = "*", created_after: str | None = None, page_size: int = 1000) -> list[dict]:
+    """Pages through a whole table ordered by military_id, optionally only rows created after a timestamp."""
+    client = await get_async_supabase()
+    rows, offset = [], 0
+    while True:
+        query = client.table(table).select(columns)
+        if created_after is not None:
+            query = query.gt("created_at", created_after)
+        query = query.order("military_id").range(offset, offset + page_size - 1)
+        page = (await execute(query)).data or []
+        rows.extend(page)
+        if len(page) < page_size:
+            return rows
+        offset += page_size
@@ -0,0 +1,106 @@
+import asyncio
+
+import pytest
+
+import context_store
+import shared_state
+from context_store import ContextStore
+from shared_state import SharedState
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(context_store.time, "monotonic", clock)
+    monkeypatch.setattr(shared_state.time, "time", clock)
+    monkeypatch.setattr(shared_state, "SHARED_STATE_EVICT_INTERVAL_SECONDS", 0)
+    return clock
+
+
+def _rows(military_id):
+    return [{"military_id": military_id, "full_name_en": f"Employee {military_id}", "rank": "Captain"}]
+
+
+def _run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_only_reference_fields_are_kept(clock):
+    store = ContextStore()
+    _run(store.set("a", _rows(1)))
+    assert _run(store.get("a")) == [{"military_id": 1, "full_name_en": "Employee 1"}]
+
+
+def test_sessions_expire_after_ttl_without_use(clock):
+    store = ContextStore(ttl_seconds=60)
+    _run(store.set("a", _rows(1)))
+    clock.now += 50
+    assert _run(store.get("a")) is not None
+    clock.now += 50
+    assert _run(store.get("a")) is not None
+    clock.now += 61
+    assert _run(store.get("a")) is None
+    assert store.stats()["sessions"] == 0
+
+
+def test_least_recently_used_session_is_evicted_first(clock):
+    store = ContextStore(max_sessions=2)
+    _run(store.set("a", _rows(1)))
+    _run(store.set("b", _rows(2)))
+    _run(store.get("a"))
+    _run(store.set("c", _rows(3)))
+    assert _run(store.get("b")) is None
+    assert _run(store.get("a")) is not None
+    assert store.evictions == 1
+
+
+def test_byte_cap_evicts_until_it_fits(clock):
+    size = context_store._estimate_size(context_store.make_references(_rows(1), 200))
+    store = ContextStore(max_bytes=size * 2)
+    for session_id in range(4):
+        _run(store.set(str(session_id), _rows(session_id)))
+    stats = store.stats()
+    assert stats["sessions"] == 2
+    assert stats["bytes"] <= size * 2
+    assert _run(store.get("0")) is None
+    assert _run(store.get("3")) is not None
+
+
+def test_empty_rows_clear_the_session(clock):
+    store = ContextStore()
+    _run(store.set("a", _rows(1)))
+    _run(store.set("a", []))
+    assert _run(store.get("a")) is None
+
+
+def test_shared_store_evicts_least_recently_used(clock, tmp_path):
+    store = ContextStore(max_sessions=2, ttl_seconds=60, shared=SharedState(str(tmp_path / "state.sqlite3")))
+    _run(store.set("a", _rows(1)))
+    clock.now += 1
+    _run(store.set("b", _rows(2)))
+    clock.now += 1
+    assert _run(store.get("a")) is not None
+    clock.now += 1
+    _run(store.set("c", _rows(3)))
+    assert _run(store.get("b")) is None
+    assert _run(store.get("a")) is not None
+    assert store.stats()["sessions"] == 2
+
+
+def test_shared_store_ttl_counts_from_last_use(clock, tmp_path):
+    store = ContextStore(ttl_seconds=60, shared=SharedState(str(tmp_path / "state.sqlite3")))
+    _run(store.set("a", _rows(1)))
+    clock.now += 50
+    assert _run(store.get("a")) is not None
+    clock.now += 50
+    assert _run(store.get("a")) is not None
+    clock.now += 61
+    assert _run(store.get("a")) is None
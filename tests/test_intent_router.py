@@ -0,0 +1,93 @@
+import pytest
+
+import intent_router
+from intent_router import FastPathRouter
+from name_index import NameIndex
+
+ROWS = [
+    {"military_id": 1, "full_name": "سلمان علي الكواري", "full_name_en": "Salman Ali Al Kuwari", "position": "سائق"},
+    {"military_id": 2, "full_name": "نواف المري", "full_name_en": "Nawaf Al Marri", "position": "Clerk"},
+    {"military_id": 3, "full_name": "عبدالرحمن أونيل", "full_name_en": "Abdul-Rahman O'Neil", "position": "Guard"},
+]
+
+
+@pytest.fixture
+def router():
+    return FastPathRouter()
+
+
+@pytest.fixture
+def indexed(monkeypatch):
+    index = NameIndex()
+    index.build(ROWS)
+    monkeypatch.setattr(intent_router, "name_index", index)
+
+
+def name_filter(column, value):
+    return {"intent": "filter", "conditions": [{"column": column, "operator": "ilike", "value": value}]}
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("How many employees are there?", {"intent": "total_count"}),
+    ("كم عدد الموظفين؟", {"intent": "total_count"}),
+    ("top 5 employees by base salary",
+     {"intent": "ordered_list", "order_by_column": "base_salary", "ascending": False, "limit": 5}),
+    ("who has the lowest housing allowance",
+     {"intent": "ordered_list", "order_by_column": "housing_allowance", "ascending": True, "limit": 1}),
+    ("أعلى 3 موظفين حسب الراتب",
+     {"intent": "ordered_list", "order_by_column": "base_salary", "ascending": False, "limit": 3}),
+    ("count by rank", {"intent": "aggregate_count", "dimension": "rank"}),
+    ("عدد الموظفين حسب الحالة الاجتماعية", {"intent": "aggregate_count", "dimension": "marital_status"}),
+])
+def test_patterns(router, query, expected):
+    assert router.route(query) == expected
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("details of Salman", name_filter("full_name_en", "salman")),
+    ("Show me the info about Salman Ali Al Kuwari", name_filter("full_name_en", "salman ali al kuwari")),
+    ("profile of Abdul-Rahman O'Neil", name_filter("full_name_en", "abdul-rahman o'neil")),
+    ("تفاصيل سلمان", name_filter("full_name", "سلمان")),
+    ("اعرض معلومات عن نواف المري", name_filter("full_name", "نواف المري")),
+    # Letter forms are kept as typed; only the name index folds them.
+    ("تفاصيل عبدالرحمن أونيل", name_filter("full_name", "عبدالرحمن أونيل")),
+])
+def test_details_of_a_name(router, indexed, query, expected):
+    assert router.route(query) == expected
+
+
+@pytest.mark.parametrize("query", [
+    "details of the employee with the highest salary",
+    "show details of his loans",
+    "details of all employees",
+    "details for each rank",
+    "details of him",
+    "details of 12345",
+    "details of Salman Ali Al Kuwari Al Marri Extra",
+    "details of Captain",
+    "details of Major",
+    "details of Private",
+    "details of married",
+    "تفاصيل كل الموظفين",
+    "تفاصيل نقيب",
+    "تفاصيل متزوج",
+])
+def test_details_of_something_else_goes_to_the_llm(router, query):
+    assert router.route(query) is None
+
+
+@pytest.mark.parametrize("query", ["تفاصيل سائق", "details of clerk", "details of Salmna"])
+def test_details_of_a_value_no_name_contains_goes_to_the_llm(router, indexed, query):
+    assert router.route(query) is None
+
+
+def test_names_route_before_the_index_is_built(router, monkeypatch):
+    monkeypatch.setattr(intent_router, "name_index", NameIndex())
+    assert router.route("details of Salmna") == name_filter("full_name_en", "salmna")
+
+
+def test_stats_count_hits_and_fallbacks(router):
+    router.route("how many employees")
+    router.route("what is the meaning of life")
+    assert router.stats()["hits"] == 1
+    assert router.stats()["fallbacks"] == 1
@@ -0,0 +1,61 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+import llm_parser
+from intent_cache import intent_cache
+
+
+class FakeCompletions:
+    """Answers each model with its canned JSON and records which models were called."""
+
+    def __init__(self, answers: dict):
+        self.answers = answers
+        self.models = []
+
+    async def create(self, model, messages, **kwargs):
+        self.models.append(model)
+        content = json.dumps(self.answers[model])
+        return SimpleNamespace(usage=None, choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+@pytest.fixture
+def answers(monkeypatch):
+    def install(small: dict, large: dict) -> FakeCompletions:
+        completions = FakeCompletions({llm_parser.LLM_SMALL_MODEL: small, llm_parser.LLM_LARGE_MODEL: large})
+        monkeypatch.setattr(llm_parser, "client", SimpleNamespace(chat=SimpleNamespace(completions=completions)))
+        monkeypatch.setattr(llm_parser, "LLM_TIERED_ROUTING", True)
+        intent_cache.clear()
+        return completions
+    return install
+
+
+LARGE = {"intent": "total_count"}
+
+
+def classify(query: str = "what is his rank?") -> dict:
+    return asyncio.run(llm_parser.parse_query_to_filter(query, None, "en"))
+
+
+@pytest.mark.parametrize("small", [
+    {"intent": "unsupported", "reason": "Which person are you asking about? Please specify a name from the list."},
+    {"intent": "unsupported", "reason": "I can only answer questions about employee records.", "confidence": "high"},
+    {"intent": "aggregate_count", "dimension": "rank"},
+])
+def test_confident_small_model_answers_are_final(answers, small):
+    completions = answers(small, LARGE)
+    assert classify()["intent"] == small["intent"]
+    assert completions.models == [llm_parser.LLM_SMALL_MODEL]
+
+
+@pytest.mark.parametrize("small", [
+    {"intent": "aggregate_count", "dimension": "rank", "confidence": "low"},
+    {"intent": "unsupported", "reason": "Not sure.", "confidence": "LOW"},
+    {"intent": "aggregate_count", "dimension": "salary_band"},
+])
+def test_low_confidence_or_invalid_answers_escalate(answers, small):
+    completions = answers(small, LARGE)
+    assert classify() == LARGE
+    assert completions.models == [llm_parser.LLM_SMALL_MODEL, llm_parser.LLM_LARGE_MODEL]
@@ -0,0 +1,61 @@
+import pytest
+
+from name_index import NameIndex
+
+ROWS = [
+    {"military_id": 1, "full_name": "سلمان علي الكواري", "full_name_en": "Salman Ali Al Kuwari", "position": "Driver"},
+    {"military_id": 2, "full_name": "علي سلمان", "full_name_en": "Ali Salman", "position": "Officer"},
+    {"military_id": 3, "full_name": "سلمان", "full_name_en": "Salman", "position": "Clerk"},
+    {"military_id": 4, "full_name": "فهد الأنصاري", "full_name_en": "Fahad Al Ansari", "position": "سائق"},
+    {"military_id": 5, "full_name": "خالد المري", "full_name_en": "Khalid Al Marri", "position": "Guard"},
+    {"military_id": 6, "full_name": "أحمد", "full_name_en": "Ahmad Bin Salmanov", "position": "Clerk"},
+]
+
+
+@pytest.fixture(scope="module")
+def index():
+    name_index = NameIndex()
+    name_index.build(ROWS)
+    return name_index
+
+
+def test_substring_matches_rank_exact_then_prefix_then_word_then_inside(index):
+    assert index.search("salman", fields=["full_name_en"], limit=None) == [3, 1, 2, 6]
+
+
+def test_limit_caps_substring_matches(index):
+    assert index.search("salman", fields=["full_name_en"], limit=2) == [3, 1]
+
+
+def test_fields_restrict_the_lookup(index):
+    assert index.search("clerk", fields=["full_name_en"], limit=None) == []
+    assert index.search("clerk", fields=["position"], limit=None) == [3, 6]
+
+
+def test_typos_fall_back_to_fuzzy_matches_closest_first(index):
+    assert index.search("salmna", fields=["full_name_en"], limit=None)[0] == 3
+    assert index.search("khalid al mari", fields=["full_name_en"], limit=None) == [5]
+
+
+def test_fuzzy_matches_are_not_mixed_into_substring_matches(index):
+    # "Salmanov" shares trigrams with "salman" but is only listed because it contains it.
+    assert set(index.search("salman", fields=["full_name_en"], limit=None)) == {1, 2, 3, 6}
+
+
+def test_fuzzy_matches_are_capped_even_without_a_limit(index, monkeypatch):
+    monkeypatch.setattr("name_index.NAME_INDEX_FUZZY_LIMIT", 1)
+    assert index.search("salmna", fields=["full_name_en"], limit=None) == [3]
+
+
+def test_queries_shorter_than_a_trigram_scan_every_name(index):
+    assert index.search("al", fields=["full_name_en"], limit=None) == [2, 4, 5, 1, 3, 6]
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("سلمان", [3, 1, 2]),
+    ("الانصاري", [4]),
+    ("احمد", [6]),
+    ("سَلْمان", [3, 1, 2]),
+])
+def test_arabic_letter_variants_and_diacritics_fold_together(index, query, expected):
+    assert index.search(query, limit=None) == expected
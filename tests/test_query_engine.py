@@ -0,0 +1,73 @@
+import base64
+import json
+
+import pytest
+
+import query_engine
+from query_engine import cursor_plan, decode_cursor, encode_cursor
+from query_plan import compile_intent
+
+PLAN = compile_intent({"intent": "ordered_list", "order_by_column": "base_salary", "ascending": False, "limit": 12})
+
+
+def test_cursor_carries_its_plan():
+    cursor = encode_cursor(PLAN, {"value": 21500, "id": 100989, "n": 5})
+    assert cursor_plan(cursor) == PLAN
+    assert decode_cursor(cursor, PLAN) == {"value": 21500, "id": 100989, "n": 5}
+
+
+def test_cursor_is_bound_to_its_plan():
+    cursor = encode_cursor(PLAN, {"n": 5})
+    with pytest.raises(ValueError, match="does not belong"):
+        decode_cursor(cursor, {**PLAN, "limit": 13})
+
+
+@pytest.mark.parametrize("cursor", ["not a cursor", "e30", "eyJuIjo1fQ"])
+def test_invalid_cursors_are_rejected(cursor):
+    with pytest.raises(ValueError, match="not valid"):
+        cursor_plan(cursor)
+
+
+def _tamper(cursor: str, **changes) -> str:
+    payload = cursor.partition(".")[0]
+    data = json.loads(base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))
+    data.update(changes)
+    edited = base64.urlsafe_b64encode(json.dumps(data).encode("utf-8")).decode("ascii").rstrip("=")
+    return f"{edited}.{cursor.partition('.')[2]}"
+
+
+def test_edited_cursors_fail_the_signature_check():
+    cursor = encode_cursor(PLAN, {"value": 21500, "id": 100989, "n": 5})
+    with pytest.raises(ValueError, match="not valid"):
+        cursor_plan(_tamper(cursor, id="0),full_name_en.ilike.*Salman*,and(military_id.gt.0"))
+    with pytest.raises(ValueError, match="not valid"):
+        cursor_plan(_tamper(cursor, p={"intent": "filter", "conditions": []}))
+    with pytest.raises(ValueError, match="not valid"):
+        cursor_plan(cursor.partition(".")[0])
+
+
+@pytest.mark.parametrize("position", [
+    {"value": 21500, "id": "0),full_name_en.ilike.*Salman*,and(military_id.gt.0", "n": 5},
+    {"value": "21500", "id": 100989, "n": 5},
+    {"value": 21500, "id": 100989, "n": -5},
+    {"value": 21500, "id": True, "n": 5},
+    {"value": 21500, "id": 100989, "n": 5, "extra": 1},
+])
+def test_positions_are_type_checked(position):
+    # Even a correctly signed cursor only carries well-typed positions.
+    with pytest.raises(ValueError, match="not valid"):
+        decode_cursor(encode_cursor(PLAN, position), PLAN)
+
+
+def test_date_keyset_values_must_be_iso_dates():
+    plan = compile_intent({"intent": "ordered_list", "order_by_column": "birth_date", "ascending": True, "limit": 100})
+    assert decode_cursor(encode_cursor(plan, {"value": "1990-01-31", "id": 7, "n": 50}), plan)["value"] == "1990-01-31"
+    with pytest.raises(ValueError, match="not valid"):
+        decode_cursor(encode_cursor(plan, {"value": "1990-01-31),or(x.eq.1", "id": 7, "n": 50}), plan)
+
+
+def test_cursors_from_another_secret_are_rejected(monkeypatch):
+    cursor = encode_cursor(PLAN, {"n": 5})
+    monkeypatch.setattr(query_engine, "CURSOR_SECRET", "rotated")
+    with pytest.raises(ValueError, match="not valid"):
+        cursor_plan(cursor)
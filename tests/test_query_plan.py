@@ -0,0 +1,52 @@
+import pytest
+
+from query_plan import PlanError, compile_intent
+
+INTENTS = [
+    {"intent": "filter", "conditions": [{"column": "total_loan", "operator": "is", "value": None}]},
+    {"intent": "filter", "conditions": [{"column": "rank", "operator": "in", "value": ["Major", "Captain"]}],
+     "columns": ["rank", "full_name"]},
+    {"intent": "filter", "conditions": [{"column": "full_name_en", "operator": "ilike", "value": "%Salman%"}]},
+    {"intent": "filter", "conditions": [{"column": "base_salary", "operator": "gte", "value": "10,000"}]},
+    {"intent": "filter", "conditions": [{"column": "birth_date", "operator": "lt", "value": "1990-01-01T00:00:00"}]},
+    {"intent": "ordered_list", "order_by_column": "base_salary", "ascending": "false", "limit": "5"},
+    {"intent": "aggregate_metric", "dimension": "rank", "metric": "average", "metric_column": "base_salary"},
+    {"intent": "find_top_group", "dimension": "rank", "metric": "sum", "metric_column": "base_salary", "ranking": "top"},
+    {"intent": "conditional_aggregate_count", "dimension": "rank",
+     "conditions": [{"column": "marital_status", "operator": "eq", "value": "Married"}]},
+    {"intent": "highest_total_compensation"},
+    {"intent": "total_count"},
+    {"intent": "unsupported", "reason": "Not about employees."},
+]
+
+
+@pytest.mark.parametrize("intent", INTENTS)
+def test_compiling_a_plan_again_returns_it_unchanged(intent):
+    plan = compile_intent(intent)
+    assert compile_intent(plan) == plan
+
+
+def test_postgrest_method_names_are_accepted_as_operators():
+    plan = compile_intent({"intent": "filter", "conditions": [{"column": "total_loan", "operator": "is_", "value": "null"}]})
+    assert plan["conditions"] == [{"column": "total_loan", "operator": "is", "value": None}]
+
+
+def test_values_are_coerced_to_column_types():
+    plan = compile_intent(INTENTS[3])
+    assert plan["conditions"][0]["value"] == 10000
+    plan = compile_intent(INTENTS[5])
+    assert plan["ascending"] is False and plan["limit"] == 5
+
+
+@pytest.mark.parametrize("intent, message", [
+    ({"intent": "filter", "conditions": [{"column": "salary", "operator": "eq", "value": 1}]}, "Unknown condition column"),
+    ({"intent": "filter", "conditions": [{"column": "base_salary", "operator": "ilike", "value": "x"}]}, "can't be used"),
+    ({"intent": "filter", "conditions": [{"column": "birth_date", "operator": "lt", "value": "yesterday"}]}, "expects a date"),
+    ({"intent": "ordered_list", "order_by_column": "base_salary", "limit": 5}, "missing ascending"),
+    ({"intent": "aggregate_metric", "dimension": "rank", "metric": "avg", "metric_column": "rank"}, "must be integer or numeric"),
+    ({"intent": "ordered_list", "order_by_column": "base_salary", "ascending": True, "limit": 0}, "positive whole number"),
+    ({"intent": "summarize"}, "Unknown intent"),
+])
+def test_invalid_plans_are_rejected(intent, message):
+    with pytest.raises(PlanError, match=message):
+        compile_intent(intent)
@@ -0,0 +1,17 @@
+from result_cache import ResultCache
+
+
+def _filter(*conditions):
+    return {"intent": "filter", "conditions": [{"column": c, "operator": o, "value": v} for c, o, v in conditions]}
+
+
+def test_ilike_case_and_condition_order_share_a_key():
+    assert ResultCache.make_key(_filter(("full_name_en", "ilike", "SALMAN"), ("rank", "eq", "Captain"))) == \
+        ResultCache.make_key(_filter(("rank", "eq", "Captain"), ("full_name_en", "ilike", "salman")))
+
+
+def test_values_are_not_rewritten():
+    assert ResultCache.make_key(_filter(("position", "eq", "007"))) != ResultCache.make_key(_filter(("position", "eq", "7")))
+    assert ResultCache.make_key(_filter(("full_name_en", "ilike", "Al."))) != \
+        ResultCache.make_key(_filter(("full_name_en", "ilike", "al")))
+    assert ResultCache.make_key(_filter(("rank", "eq", "Captain"))) != ResultCache.make_key(_filter(("rank", "eq", "captain")))
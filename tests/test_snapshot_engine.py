@@ -0,0 +1,91 @@
+import pytest
+
+from query_plan import compile_intent
+from snapshot_engine import EmployeeSnapshot
+
+ROWS = [
+    {"military_id": 1, "full_name_en": "Salman Al Kuwari", "rank": "Captain", "base_salary": 9000, "housing_allowance": 1000, "on_leave": True},
+    {"military_id": 2, "full_name_en": "Nawaf Al Marri", "rank": "Major", "base_salary": 12000, "housing_allowance": None, "on_leave": False},
+    {"military_id": 3, "full_name_en": "Fahad Salman", "rank": "Captain", "base_salary": 12000, "housing_allowance": 1500, "on_leave": None},
+    {"military_id": 4, "full_name_en": "Saud Al Naimi", "rank": None, "base_salary": None, "housing_allowance": 500, "on_leave": False},
+    {"military_id": 5, "full_name_en": "Ali Al Dosari", "rank": "Major", "base_salary": 7000, "housing_allowance": 2000, "on_leave": True},
+    {"military_id": 6, "full_name_en": "Khalid Al Attiyah", "rank": "Private", "base_salary": None, "housing_allowance": None, "on_leave": None},
+]
+
+
+@pytest.fixture(scope="module")
+def snapshot():
+    return EmployeeSnapshot(ROWS)
+
+
+def run(snapshot, intent):
+    return snapshot.run_intent(compile_intent(intent))
+
+
+def ids(rows):
+    return [row["military_id"] for row in rows]
+
+
+def test_count_by_reports_null_as_its_own_group(snapshot):
+    rows = run(snapshot, {"intent": "aggregate_count", "dimension": "rank"})
+    assert {row["category"]: row["count"] for row in rows} == {"Captain": 2, "Major": 2, "Private": 1, None: 1}
+    assert [row["count"] for row in rows] == [2, 2, 1, 1]
+
+
+def test_conditional_count_by_applies_the_filter(snapshot):
+    rows = run(snapshot, {"intent": "conditional_aggregate_count", "dimension": "rank",
+                          "conditions": [{"column": "base_salary", "operator": "gte", "value": "9000"}]})
+    assert rows == [{"category": "Captain", "count": 2}, {"category": "Major", "count": 1}]
+
+
+@pytest.mark.parametrize("metric, expected", [
+    ("sum", {"Captain": 21000, "Major": 19000, "Private": None, None: None}),
+    ("avg", {"Captain": 10500.0, "Major": 9500.0, "Private": None, None: None}),
+    ("min", {"Captain": 9000, "Major": 7000, "Private": None, None: None}),
+    ("max", {"Captain": 12000, "Major": 12000, "Private": None, None: None}),
+])
+def test_metrics_skip_nulls_and_empty_groups_aggregate_to_null(snapshot, metric, expected):
+    rows = run(snapshot, {"intent": "aggregate_metric", "dimension": "rank", "metric": metric, "metric_column": "base_salary"})
+    assert {row["category"]: row["value"] for row in rows} == expected
+    # Groups with a NULL aggregate come last.
+    assert [row["value"] is None for row in rows] == [False, False, True, True]
+
+
+def test_top_group_ignores_null_aggregates(snapshot):
+    intent = {"intent": "find_top_group", "dimension": "rank", "metric_column": "base_salary", "metric": "avg"}
+    assert run(snapshot, {**intent, "ranking": "highest"}) == [{"category": "Captain", "value": 10500.0}]
+    assert run(snapshot, {**intent, "ranking": "lowest"}) == [{"category": "Major", "value": 9500.0}]
+
+
+def test_top_k_skips_nulls_and_breaks_ties_by_table_order(snapshot):
+    intent = {"intent": "ordered_list", "order_by_column": "base_salary", "limit": 3}
+    assert ids(run(snapshot, {**intent, "ascending": False})) == [2, 3, 1]
+    assert ids(run(snapshot, {**intent, "ascending": True})) == [5, 1, 2]
+    assert ids(run(snapshot, {**intent, "ascending": False, "limit": 10})) == [2, 3, 1, 5]
+
+
+def test_top_total_compensation_treats_null_components_as_zero(snapshot):
+    rows = run(snapshot, {"intent": "highest_total_compensation", "limit": 2})
+    assert [(row["military_id"], row["total_compensation"]) for row in rows] == [(3, 13500), (2, 12000)]
+
+
+@pytest.mark.parametrize("condition, expected", [
+    ({"column": "base_salary", "operator": "is", "value": "null"}, [4, 6]),
+    ({"column": "rank", "operator": "is", "value": None}, [4]),
+    ({"column": "on_leave", "operator": "is", "value": "true"}, [1, 5]),
+    ({"column": "on_leave", "operator": "is", "value": False}, [2, 4]),
+    ({"column": "base_salary", "operator": "neq", "value": 12000}, [1, 5]),
+    ({"column": "rank", "operator": "neq", "value": "Captain"}, [2, 5, 6]),
+    ({"column": "base_salary", "operator": "in", "value": [7000, 12000]}, [2, 3, 5]),
+    ({"column": "full_name_en", "operator": "ilike", "value": "salman"}, [1, 3]),
+])
+def test_filters_match_sql_null_semantics(snapshot, condition, expected):
+    # The snapshot takes plans straight from compile_intent, except on_leave, which isn't a qag_employees column.
+    if condition["column"] != "on_leave":
+        condition = compile_intent({"intent": "filter", "conditions": [condition]})["conditions"][0]
+    assert ids(snapshot.run_intent({"intent": "filter", "conditions": [condition]})) == expected
+
+
+def test_is_true_is_rejected_on_numeric_columns(snapshot):
+    with pytest.raises(ValueError):
+        snapshot.run_intent({"intent": "filter", "conditions": [{"column": "base_salary", "operator": "is", "value": True}]})
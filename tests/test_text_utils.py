@@ -0,0 +1,35 @@
+from text_utils import detect_language, fold_text, normalize_text
+
+
+def test_alef_forms_fold_to_bare_alef():
+    assert normalize_text("أحمد") == normalize_text("احمد") == normalize_text("إحمد") == normalize_text("آحمد")
+
+
+def test_taa_marbuta_and_alef_maqsura():
+    assert normalize_text("فاطمة") == normalize_text("فاطمه")
+    assert normalize_text("مصطفى") == normalize_text("مصطفي")
+
+
+def test_diacritics_and_tatweel_are_stripped():
+    assert normalize_text("مُحَمَّد") == normalize_text("محمد")
+    assert normalize_text("محـــمد") == normalize_text("محمد")
+
+
+def test_case_whitespace_and_trailing_punctuation():
+    assert normalize_text("  Salman   AL-Otaibi ?") == "salman al-otaibi"
+    assert normalize_text("من هو أحمد؟") == "من هو احمد"
+
+
+def test_fold_text_keeps_letter_forms():
+    assert fold_text("أَحمد") == "أحمد"
+    assert fold_text("فاطمة") != fold_text("فاطمه")
+    assert len(fold_text("أحمد فاطمة")) == len(normalize_text("أحمد فاطمة"))
+
+
+def test_none_is_empty():
+    assert normalize_text(None) == ""
+
+
+def test_detect_language():
+    assert detect_language("تفاصيل الموظف") == "ar"
+    assert detect_language("details of Salman") == "en"
@@ -0,0 +1,41 @@
+import re
+import unicodedata
+
+# Harakat, tanween, shadda, sukun, superscript alef and the tatweel (kashida) character.
+ARABIC_DIACRITICS = re.compile(r"[\u0610-\u061A\u064B-\u065F\u0670\u06D6-\u06ED\u0640]")
+
+ARABIC_LETTER_MAP = str.maketrans({
+    "\u0623": "\u0627",
+    "\u0625": "\u0627",
+    "\u0622": "\u0627",
+    "\u0671": "\u0627",
+    "\u0649": "\u064A",
+    "\u0629": "\u0647",
+})
+
+WHITESPACE = re.compile(r"\s+")
+TRAILING_PUNCTUATION = re.compile(r"[\s?!.,;:؟،؛]+$")
+
+
+def fold_text(text: str) -> str:
+    """Strips diacritics and folds case and whitespace, keeping the original letter forms."""
+    text = unicodedata.normalize("NFKC", text or "")
+    text = ARABIC_DIACRITICS.sub("", text)
+    text = text.casefold()
+    text = WHITESPACE.sub(" ", text).strip()
+    return TRAILING_PUNCTUATION.sub("", text)
+
+
+def normalize_text(text: str) -> str:
+    """
+    Normalizes Arabic/English text so equivalent spellings compare equal.
+    Strips diacritics, unifies alef/yaa/taa-marbuta forms, folds case and whitespace.
+    The letter mapping is one-to-one, so offsets line up with fold_text() of the same input.
+    """
+    return fold_text(text).translate(ARABIC_LETTER_MAP)
+
+
+def detect_language(text: str) -> str:
+    """Detects if the primary language of the text is Arabic or English."""
+    arabic_chars = sum(1 for char in text if '\u0600' <= char <= '\u06FF')
+    return 'ar' if arabic_chars > 2 else 'en'